@@ -0,0 +1,301 @@
+"""Headless batch analysis of many YouTube videos.
+
+Library use::
+
+    analyzer = BatchAnalyzer(yt, CommentFilter(), SentimentService(), db, quota_budget=10000)
+    report = analyzer.run(video_ids)
+
+Command line::
+
+    python batch_cli.py VIDEO_URL_OR_ID ... [--playlist URL_OR_ID] [--file ids.txt]
+                        [--quota 10000] [--concurrency 4] [--workers N]
+                        [--checkpoint batch_checkpoint.json] [--no-db] [--metrics metrics.jsonl]
+                        [--export results/]
+"""
+import argparse, json, math, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from youtube_client import YouTubeClient, QuotaExceededError, sanitize_text
+from comment_filter import CommentFilter
+from scoring_engine import ScoringEngine, BACKENDS
+from sentiment_service import SentimentService, SentimentAggregate
+from sentiment_cache import SentimentCache
+from db_handler import group_rows
+from dedup import DuplicateIndex
+from instrumentation import RunMetrics
+
+# YouTube's default daily quota for a project
+DEFAULT_DAILY_QUOTA = 10000
+
+class Checkpoint:
+    """JSON record of finished and failed videos, resolved playlists and today's quota use.
+
+    Rewritten atomically after every video, so an interrupted run resumes
+    where it stopped without listing its playlists again. Quota use resets
+    when the UTC day changes, as YouTube's does.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.done = {}
+        self.failed = {}
+        self.playlists = {}
+        self.quota_day = time.strftime('%Y-%m-%d', time.gmtime())
+        self.quota_units = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.done = state.get('done', {})
+            self.failed = state.get('failed', {})
+            self.playlists = state.get('playlists', {})
+            if state.get('quota_day') == self.quota_day:
+                self.quota_units = state.get('quota_units', 0)
+
+    def record(self, video_id: str = None, result: dict = None, error: str = None, quota_units: int = 0,
+               playlist: tuple = None):
+        # playlist: (playlist_id, video_ids) as resolved
+        with self._lock:
+            if playlist:
+                self.playlists[playlist[0]] = playlist[1]
+            if video_id and error is None:
+                self.done[video_id] = result
+                self.failed.pop(video_id, None)
+            elif video_id:
+                self.failed[video_id] = error
+            self.quota_units += quota_units
+            if self.path:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump({'done': self.done, 'failed': self.failed, 'playlists': self.playlists,
+                               'quota_day': self.quota_day, 'quota_units': self.quota_units}, f)
+                os.replace(tmp, self.path)
+
+    def remaining(self, budget: int) -> int:
+        """Units of a daily ``budget`` not yet used today."""
+        return max(budget - self.quota_units, 0)
+
+class BatchAnalyzer:
+    """Fetch, score and store many videos concurrently within a quota budget.
+
+    A video is only started when the units used so far plus the estimated
+    cost of every video in flight, itself included, fit in the budget left
+    for today; videos that do not fit are deferred to the next run. The
+    YouTube client's QuotaTracker enforces the same budget as a hard limit.
+    Scoring goes through the SentimentService's ScoringEngine, so the pages
+    of videos fetched concurrently are scored in its worker processes. With
+    a ``ResultStore``, each video is also written as a Parquet file.
+    """
+
+    def __init__(self, yt: YouTubeClient, comment_filter: CommentFilter, sent: SentimentService, db=None,
+                 max_comments: int = 4000, quota_budget: int = DEFAULT_DAILY_QUOTA, concurrency: int = 4,
+                 checkpoint: Checkpoint = None, log=print, metrics_path: str = None, store=None):
+        self.yt = yt
+        self.filter = comment_filter
+        self.sent = sent
+        self.db = db
+        self.store = store
+        self.max_comments = max_comments
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint or Checkpoint()
+        self.log = log
+        self.metrics_path = metrics_path
+        self._metrics_lock = threading.Lock()
+        self.yt.quota.budget = self.yt.quota.units + self.checkpoint.remaining(quota_budget)
+
+    def estimate_units(self) -> int:
+        # one title lookup plus one unit per page of 100 threads, with headroom for filtered spam
+        return 1 + math.ceil(self.max_comments / 100 * 1.25)
+
+    def analyze_video(self, video_id: str) -> dict:
+        metrics = RunMetrics(f'batch:{video_id}')
+        try:
+            with metrics.activate():
+                return self._analyze_video(video_id)
+        finally:
+            if self.metrics_path:
+                with self._metrics_lock:
+                    metrics.write_jsonl(self.metrics_path)
+
+    def _analyze_video(self, video_id: str) -> dict:
+        start = time.perf_counter()
+        title = self.yt.get_video_title(video_id)
+        agg = SentimentAggregate(max_rows=0)
+        link = f'https://www.youtube.com/watch?v={video_id}'
+        load = self.db.begin_load(video_id, title, link) if self.db else None
+        export = self.store.begin(video_id, title, link) if self.store else None
+        dedup = DuplicateIndex()
+        try:
+            for page in self.yt.get_comment_pages(video_id, self.filter, self.max_comments):
+                groups = dedup.collapse(page)
+                batch = self.sent.analyze_groups(groups, [sanitize_text(g.comment.text) for g in groups], subjectivity=True)
+                agg.update(batch)
+                if load or export:
+                    rows, repeats = group_rows(groups, batch)
+                for sink in (load, export):
+                    if sink:
+                        sink.add(rows)
+                        sink.add_repeats(repeats)
+            summary = agg.to_summary()
+            if load:
+                load.commit(summary)
+            if export:
+                export.commit(summary)
+        except Exception:
+            if load:
+                load.abort()
+            if export:
+                export.abort()
+            raise
+        # the word index goes to the database and result file only, not into the checkpoint
+        del summary['tokens']
+        return {'title': title, 'seconds': round(time.perf_counter() - start, 3), 'unique': len(dedup), **summary}
+
+    def run(self, video_ids: list) -> dict:
+        """Analyze every video not already done in the checkpoint and return a run report."""
+        unique = list(dict.fromkeys(video_ids))
+        todo = [v for v in unique if v not in self.checkpoint.done]
+        if len(todo) < len(unique):
+            self.log(f'Resuming: {len(unique) - len(todo)} videos already done')
+        quota = self.yt.quota
+        estimate = self.estimate_units()
+        start = time.perf_counter()
+        units_start = recorded = quota.units
+        analyzed, failed, deferred = [], [], []
+        queue = list(reversed(todo))
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while queue or in_flight:
+                while queue and len(in_flight) < self.concurrency \
+                        and quota.units + estimate * (len(in_flight) + 1) <= quota.budget:
+                    vid = queue.pop()
+                    in_flight[pool.submit(self.analyze_video, vid)] = vid
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    vid = in_flight.pop(fut)
+                    # units are charged to whichever video finishes next; the daily total stays exact
+                    units, recorded = quota.units - recorded, quota.units
+                    try:
+                        result = fut.result()
+                    except QuotaExceededError as e:
+                        deferred.append(vid)
+                        self.checkpoint.record(quota_units=units)
+                        self.log(f'{vid}: deferred ({e})')
+                        continue
+                    except Exception as e:
+                        failed.append(vid)
+                        self.checkpoint.record(vid, error=str(e), quota_units=units)
+                        self.log(f'{vid}: failed ({e})')
+                        continue
+                    analyzed.append(vid)
+                    self.checkpoint.record(vid, result, quota_units=units)
+                    self.log(f"{vid}: {result['total']} comments ({result['unique']} unique) in {result['seconds']:.1f}s, "
+                             f"quota {self.checkpoint.quota_units} units used today")
+        deferred.extend(reversed(queue))
+        if deferred:
+            self.log(f'{len(deferred)} videos deferred: not enough quota left today')
+        elapsed = time.perf_counter() - start
+        return {
+            'analyzed': len(analyzed),
+            'failed': failed,
+            'deferred': deferred,
+            'comments': sum(self.checkpoint.done[v]['total'] for v in analyzed),
+            'seconds': round(elapsed, 3),
+            'videos_per_minute': round(len(analyzed) / elapsed * 60, 2) if elapsed else 0.0,
+            'quota_units': quota.units - units_start,
+            'quota_units_today': self.checkpoint.quota_units,
+            'quota_calls': dict(quota.calls),
+        }
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Analyze the comments of many YouTube videos headlessly.')
+    parser.add_argument('videos', nargs='*', help='video URLs or IDs')
+    parser.add_argument('--playlist', action='append', default=[], help='playlist URL or ID (repeatable)')
+    parser.add_argument('--file', help='file with one video URL or ID per line')
+    parser.add_argument('--max-comments', type=int, default=4000)
+    parser.add_argument('--quota', type=int, default=DEFAULT_DAILY_QUOTA, help='daily quota budget in units')
+    parser.add_argument('--concurrency', type=int, default=4, help='videos fetched at once')
+    parser.add_argument('--workers', type=int, default=None, help='scoring processes (default: all cores)')
+    parser.add_argument('--backend', choices=BACKENDS, default='vader', help='VADER implementation used for scoring')
+    parser.add_argument('--checkpoint', default='batch_checkpoint.json', help='progress file used to resume')
+    parser.add_argument('--report', help='write the run report as JSON to this path')
+    parser.add_argument('--no-db', action='store_true', help='do not store results in Supabase')
+    parser.add_argument('--export', help='also write each video as a Parquet file into this directory')
+    parser.add_argument('--metrics', help='append per-video stage metrics as JSON lines to this path')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    yt = YouTubeClient(os.getenv('YT_API_KEY'))
+    sources = list(args.videos)
+    if args.file:
+        with open(args.file) as f:
+            sources.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    video_ids = []
+    for src in sources:
+        video_ids.append(src if len(src) == 11 and '/' not in src else yt.extract_video_id(src))
+    # playlist listings count against today's quota and are kept for resumed runs;
+    # one the budget left today cannot list is deferred like a video
+    checkpoint = Checkpoint(args.checkpoint)
+    yt.quota.budget = yt.quota.units + checkpoint.remaining(args.quota)
+    deferred_playlists = []
+    for playlist in args.playlist:
+        pid = yt.extract_playlist_id(playlist)
+        if pid not in checkpoint.playlists:
+            units = yt.quota.units
+            try:
+                ids = yt.get_playlist_video_ids(pid)
+            except QuotaExceededError as e:
+                checkpoint.record(quota_units=yt.quota.units - units)
+                deferred_playlists.append(pid)
+                print(f'{pid}: playlist deferred ({e})')
+                continue
+            checkpoint.record(quota_units=yt.quota.units - units, playlist=(pid, ids))
+        video_ids.extend(checkpoint.playlists[pid])
+    if not video_ids:
+        if deferred_playlists:
+            print(f'Deferred to the next run: {len(deferred_playlists)} playlists')
+            yt.close()
+            return 0
+        parser.error('no videos given')
+
+    db = None
+    if not args.no_db:
+        from db_handler import DBHandler
+        db = DBHandler()
+    store = None
+    if args.export:
+        from result_store import ResultStore
+        store = ResultStore(args.export)
+    sent = SentimentService(
+        engine=ScoringEngine(workers=args.workers, backend=args.backend),
+        cache=SentimentCache(path=os.getenv('SENTIMENT_CACHE_PATH'))
+    )
+    analyzer = BatchAnalyzer(
+        yt, CommentFilter(), sent, db, max_comments=args.max_comments, quota_budget=args.quota,
+        concurrency=args.concurrency, checkpoint=checkpoint, metrics_path=args.metrics,
+        store=store
+    )
+    try:
+        report = analyzer.run(video_ids)
+    finally:
+        sent.engine.close()
+        yt.close()
+    print(f"Analyzed {report['analyzed']} videos ({report['comments']} comments) in {report['seconds']:.1f}s: "
+          f"{report['videos_per_minute']:.2f} videos/minute")
+    print(f"Quota: {report['quota_units']} units this run, {report['quota_units_today']} today {report['quota_calls']}")
+    if report['failed']:
+        print(f"Failed: {', '.join(report['failed'])}")
+    report['deferred_playlists'] = deferred_playlists
+    if report['deferred']:
+        print(f"Deferred to the next run: {len(report['deferred'])} videos")
+    if deferred_playlists:
+        print(f"Deferred to the next run: {len(deferred_playlists)} playlists")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
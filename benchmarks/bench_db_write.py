@@ -0,0 +1,43 @@
+"""Write latency of the legacy delete-then-insert persist path vs the bulk RPC path.
+
+Runs DBHandler against the local PostgREST stand-in with a fixed per-request latency.
+Run from the repo root: python -m benchmarks.bench_db_write [n_comments] [latency_s]
+"""
+import os, sys, time
+from benchmarks.corpus import make_corpus
+from benchmarks.fake_postgrest import FakePostgREST
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    comments = make_corpus(n)
+    likes = list(range(n))
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(n)]
+    labels = ['Positive' if s >= 0.05 else 'Negative' if s <= -0.05 else 'Neutral' for s in scores]
+    yt_ids = [f'c{i:07d}' for i in range(n)]
+    with FakePostgREST(latency=latency) as pg:
+        os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'] = pg.url, pg.key
+        from db_handler import DBHandler, comment_rows
+        db = DBHandler()
+
+        def legacy():
+            db.insert_video('vid00000000', 'Fake', 'https://youtu.be/vid00000000')
+            db.delete_comments_for_video('vid00000000')
+            ids = db.insert_comments_batch('vid00000000', comments, likes, yt_ids=yt_ids)
+            db.insert_sentiments_batch(ids, labels, scores)
+
+        rows = comment_rows(comments, likes, yt_ids, None, None, labels, scores)
+        def bulk():
+            db.replace_video_analysis('vid00000000', 'Fake', 'https://youtu.be/vid00000000', rows)
+
+        print(f'{n} comments, {latency * 1000:.0f} ms per request')
+        for name, fn in (('legacy delete+insert', legacy), ('bulk replace RPC', bulk), ('legacy again', legacy)):
+            before = pg.requests
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            stored = pg.db.execute("select count(*) from comments where video_id = 'vid00000000'").fetchone()[0]
+            print(f'{name:<22} {elapsed:>7.2f}s {pg.requests - before:>5} requests {stored:>7} rows stored')
+
+if __name__ == '__main__':
+    main()
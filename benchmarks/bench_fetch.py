@@ -0,0 +1,61 @@
+"""Offline comment-fetch throughput against the fake YouTube server.
+
+Compares the original one-page-at-a-time loop (fixed 0.1s sleep) with the
+prefetching YouTubeClient, with and without parallel reply fetching.
+Run from the repo root: python -m benchmarks.bench_fetch [n_comments] [latency_s]
+"""
+import sys, time
+import httpx
+from comment_filter import CommentFilter
+from youtube_client import YouTubeClient, clean_comment_text
+from benchmarks.fake_youtube import FakeYouTubeServer
+
+def legacy_get_comments(base_url: str, video_id: str, comment_filter, max_comments: int) -> list:
+    # the original serial loop: fetch, filter, then sleep before the next page
+    comments, token = [], None
+    with httpx.Client(base_url=base_url, params={'key': 'k'}) as http:
+        while True:
+            resp = http.get('/commentThreads', params={
+                'part': 'snippet', 'videoId': video_id, 'maxResults': 100,
+                **({'pageToken': token} if token else {})
+            }).json()
+            for item in resp.get('items', []):
+                snippet = item['snippet']['topLevelComment']['snippet']
+                txt = clean_comment_text(snippet.get('textDisplay', ''))
+                if not comment_filter.is_spam(txt):
+                    comments.append((txt, snippet.get('likeCount', 0)))
+                    if len(comments) >= max_comments:
+                        return comments
+            token = resp.get('nextPageToken')
+            if not token:
+                return comments
+            time.sleep(0.1)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    cf = CommentFilter()
+    with FakeYouTubeServer(n_comments=n, replies_per_thread=8, latency=latency) as yt:
+        start = time.perf_counter()
+        legacy = legacy_get_comments(yt.url, 'vid00000000', cf, n * 10)
+        legacy_s = time.perf_counter() - start
+        print(f'{"original loop":<22} {len(legacy):>7} comments {legacy_s:>7.2f}s {len(legacy) / legacy_s:>9.0f}/s')
+        for label, replies in (('prefetching client', False), ('with parallel replies', True)):
+            client = YouTubeClient('k', base_url=yt.url)
+            start = time.perf_counter()
+            got = client.get_comments('vid00000000', cf, max_comments=n * 10, include_replies=replies)
+            elapsed = time.perf_counter() - start
+            client.close()
+            print(f'{label:<22} {len(got):>7} comments {elapsed:>7.2f}s {len(got) / elapsed:>9.0f}/s'
+                  f'  quota {client.quota.units} units {client.quota.calls}')
+        yt.throttle_every = 7
+        client = YouTubeClient('k', base_url=yt.url)
+        start = time.perf_counter()
+        got = client.get_comments('vid00000000', cf, max_comments=n * 10)
+        elapsed = time.perf_counter() - start
+        client.close()
+        print(f'{"throttled (1 in 7 429)":<22} {len(got):>7} comments {elapsed:>7.2f}s {len(got) / elapsed:>9.0f}/s'
+              f'  quota {client.quota.units} units')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Comments/second of CommentFilter.is_spam against the original implementation.
+
+Run from the repo root: python -m benchmarks.bench_filter [n_comments]
+"""
+import re, sys, time
+from comment_filter import CommentFilter
+from benchmarks.corpus import make_corpus
+
+def legacy_is_spam(comment: str) -> bool:
+    # CommentFilter.is_spam before the compiled engine, kept as the baseline
+    if len(comment.split()) >= 200:
+        return True
+    if re.fullmatch(r'^(?:\s|' + CommentFilter.EMOJI_RE.pattern + r')+?$', comment):
+        return True
+    no_space = comment.replace(' ', '')
+    if no_space:
+        emo_cnt = len(CommentFilter.EMOJI_RE.findall(no_space))
+        if emo_cnt / len(no_space) >= 0.6:
+            return True
+    for pat in CommentFilter.SPAM_PATTERNS:
+        if re.search(pat, comment):
+            return True
+    return False
+
+def measure(fn, corpus: list) -> float:
+    start = time.perf_counter()
+    fn(corpus)
+    return len(corpus) / (time.perf_counter() - start)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = make_corpus(n) + ['', ' ', '\n', 'word ' * 250, '\U0001F525 \U0001F525 hi']
+    cf = CommentFilter()
+    expected = [legacy_is_spam(c) for c in corpus]
+    if [cf.is_spam(c) for c in corpus] != expected:
+        raise AssertionError('compiled filter disagrees with the original implementation')
+    legacy = measure(lambda cs: [legacy_is_spam(c) for c in cs], corpus)
+    single = measure(lambda cs: [cf.is_spam(c) for c in cs], corpus)
+    batch = measure(cf.filter_many, corpus)
+    print(f'{len(corpus)} comments, {sum(expected)} spam')
+    print(f'{"original is_spam":<20} {legacy:>12.0f} comments/s')
+    print(f'{"compiled is_spam":<20} {single:>12.0f} comments/s ({single / legacy:.2f}x)')
+    print(f'{"filter_many":<20} {batch:>12.0f} comments/s ({batch / legacy:.2f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Speedup curve of ScoringEngine from 1 to N workers.
+
+Run from the repo root: python -m benchmarks.bench_scoring [n_comments] [max_workers]
+"""
+import os, sys, time
+from scoring_engine import ScoringEngine
+from benchmarks.corpus import make_corpus
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    corpus = make_corpus(n)
+    baseline, reference = None, None
+    print(f'{n} comments, VADER + subjectivity')
+    print(f'{"workers":>7} {"seconds":>8} {"comments/s":>11} {"speedup":>8}')
+    workers = 1
+    while True:
+        engine = ScoringEngine(workers=workers, serial_threshold=0)
+        engine.score(corpus[:workers * engine.chunk_size], subjectivity=True)  # warm up the pool
+        start = time.perf_counter()
+        result = engine.score(corpus, subjectivity=True)
+        elapsed = time.perf_counter() - start
+        engine.close()
+        if reference is None:
+            baseline, reference = elapsed, result
+        elif result != reference:
+            raise AssertionError(f'output with {workers} workers differs from serial order')
+        print(f'{workers:>7} {elapsed:>8.2f} {n / elapsed:>11.0f} {baseline / elapsed:>7.2f}x')
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Cold-start cost of the Streamlit app: module import time and time-to-first-render.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+Run from the repo root: python -m benchmarks.bench_startup [repeats]
+"""
+import json, os, subprocess, sys
+
+IMPORT_SNIPPET = '''
+import json, sys, time
+t = time.perf_counter(); import streamlit; base = time.perf_counter() - t
+t = time.perf_counter(); import sentiment_analysis; app = time.perf_counter() - t
+heavy = [m for m in ('pandas', 'altair', 'textblob', 'wordcloud', 'supabase', 'httpx', 'vaderSentiment')
+         if m in sys.modules]
+print(json.dumps({'streamlit': base, 'app': app, 'heavy_loaded': heavy}))
+'''
+
+RENDER_SNIPPET = '''
+import json, time
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file('sentiment_analysis.py', default_timeout=120).run()
+first = time.perf_counter() - t
+t = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - t
+print(json.dumps({'first_render': first, 'rerun': rerun, 'exceptions': [e.value for e in at.exception]}))
+'''
+
+def run(snippet: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, '-c', snippet], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    imports = [run(IMPORT_SNIPPET) for _ in range(repeats)]
+    renders = [run(RENDER_SNIPPET) for _ in range(repeats)]
+    best = lambda rows, key: min(r[key] for r in rows)
+    print(f'import streamlit          {best(imports, "streamlit"):>7.3f}s')
+    print(f'import sentiment_analysis {best(imports, "app"):>7.3f}s  (on top of streamlit)')
+    print(f'heavy modules at import   {", ".join(imports[0]["heavy_loaded"]) or "none"}')
+    print(f'time to first render      {best(renders, "first_render"):>7.3f}s')
+    print(f'rerun                     {best(renders, "rerun"):>7.3f}s')
+    if renders[0]['exceptions']:
+        print('exceptions:', renders[0]['exceptions'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Parity and throughput of VectorizedVader against vaderSentiment.
+
+Checks that every compound score matches the reference exactly, on the
+synthetic comment corpus plus a stress corpus dense in the constructs VADER
+special-cases (negations, boosters, ALL CAPS, "but", "kind of", "least",
+idioms, emoji, punctuation), then times both. Each corpus is also
+scored by threads sharing one scorer whose token memo is kept small, as the
+scoring engine's serial path shares it between fetch threads.
+Run from the repo root: python -m benchmarks.bench_vader [n_comments]
+"""
+import random, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.corpus import make_corpus, EMOJI
+from vader_vectorized import VectorizedVader
+
+STRESS_WORDS = (
+    'good great bad terrible love hate kind of no not never so this without doubt least at very '
+    'but nor or really extremely barely kinda sort just enough the shit bomb bad ass bus stop yeah '
+    'right kiss death to die for beating heart isn\'t don\'t wasn\'t uh-uh nothing rarely despite '
+    'sux lol :) :( :D <3 happy sad funny cool awful best worst totally slightly most less'
+).split()
+
+def make_stress_corpus(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        words = []
+        for _ in range(rng.randint(0, 25)):
+            w = rng.choice(STRESS_WORDS)
+            roll = rng.random()
+            if roll < 0.15:
+                w = w.upper()
+            elif roll < 0.2:
+                w = w.capitalize()
+            elif roll < 0.3:
+                w += rng.choice(['!', '?', '.', ',', '!!', '?!', '...'])
+            elif roll < 0.35:
+                w = rng.choice(EMOJI) + (w if rng.random() < 0.5 else '')
+            words.append(w)
+        out.append(rng.choice([' ', '  ', ' \n ']).join(words))
+    return out
+
+def _check(name: str, corpus: list, expected: list, got: list):
+    bad = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+    if bad:
+        i = bad[0]
+        raise AssertionError(f'{len(bad)} {name} scores differ, first {corpus[i]!r}: {expected[i]} != {got[i]}')
+
+def check_threaded(name: str, corpus: list, expected: list, threads: int = 8, chunk: int = 100):
+    shared = VectorizedVader(max_tokens=50)
+    chunks = [corpus[i:i+chunk] for i in range(0, len(corpus), chunk)]
+    with ThreadPoolExecutor(threads) as pool:
+        got = [c for part in pool.map(shared.compound, chunks) for c in part]
+    _check(f'{name} threaded', corpus, expected, got)
+    print(f'{name:<9} {len(corpus)} texts identical over {threads} threads sharing one scorer')
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    reference = SentimentIntensityAnalyzer()
+    fast = VectorizedVader()
+    for name, corpus in (('comments', make_corpus(n, duplicates=0.1)), ('stress', make_stress_corpus(n))):
+        start = time.perf_counter()
+        expected = [reference.polarity_scores(t)['compound'] for t in corpus]
+        ref_s = time.perf_counter() - start
+        fast.compound(corpus[:100])  # warm the token index like a long-running service
+        start = time.perf_counter()
+        got = fast.compound(corpus)
+        fast_s = time.perf_counter() - start
+        _check(name, corpus, expected, got)
+        print(f'{name:<9} {n} texts identical | vaderSentiment {n / ref_s:>9.0f}/s | '
+              f'vectorized {n / fast_s:>9.0f}/s ({ref_s / fast_s:.1f}x)')
+        check_threaded(name, corpus, expected)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import random
+
+WORDS = (
+    'love great awesome amazing best good nice cool funny epic wow happy '
+    'hate bad worst terrible boring awful sad stupid annoying trash fake '
+    'video song music part first time watching again year people still '
+    'this that the is was it so really very not never just like'
+).split()
+EMOJI = ['❤️', '\U0001F525', '\U0001F602', '\U0001F60D', '\U0001F44D', '\U0001F62D', '✨']
+SPAM = [
+    'check out my channel for more', 'subscribe to my channel pls',
+    'free robux at https://example.com', 'call me 12345678901',
+]
+MEMES = ['first', 'who is watching in 2024?', 'this song never gets old', '❤️\U0001F525']
+FLOODS = [
+    'I made $5000 last week working from home, the guide is on my page',
+    'This comment section is full of legends, keep scrolling to find the best one',
+    'Nobody is going to read this but I hope your day is amazing',
+]
+
+def make_comment(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.05:
+        return rng.choice(SPAM)
+    if roll < 0.15:
+        return rng.choice(MEMES)
+    if roll < 0.20:
+        return ''.join(rng.choices(EMOJI, k=rng.randint(1, 6)))
+    words = rng.choices(WORDS, k=rng.randint(3, 40))
+    if rng.random() < 0.3:
+        words.append(rng.choice(EMOJI))
+    text = ' '.join(words)
+    if rng.random() < 0.2:
+        text = text.capitalize() + '!' * rng.randint(1, 3)
+    return text
+
+def make_flood_comment(rng: random.Random) -> str:
+    # a bot or copy-paste chain variant: recased, re-punctuated, stretched or decorated
+    text = rng.choice(FLOODS)
+    roll = rng.random()
+    if roll < 0.2:
+        text = text.upper()
+    elif roll < 0.4:
+        text = text.lower()
+    if rng.random() < 0.3:
+        text += rng.choice(['!', '!!!', '...', ' ' + rng.choice(EMOJI)])
+    if rng.random() < 0.2:
+        text = text.replace('o', 'ooo', 1)
+    if rng.random() < 0.1:
+        i = rng.randrange(len(text))
+        text = text[:i] + text[i + 1:]
+    return text
+
+def make_corpus(n: int, seed: int = 0, duplicates: float = 0.0, floods: float = 0.0) -> list:
+    """Return ``n`` seeded synthetic comments mixing prose, emoji, memes and spam.
+
+    With ``duplicates`` > 0 that fraction of comments repeats an earlier one
+    verbatim, like copy-pasted replies and bot reposts. With ``floods`` > 0
+    that fraction are slightly varied copies of a few bot messages.
+    """
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if floods and rng.random() < floods:
+            out.append(make_flood_comment(rng))
+        elif out and duplicates and rng.random() < duplicates:
+            out.append(rng.choice(out))
+        else:
+            out.append(make_comment(rng))
+    return out
+
+def to_html(comments: list, seed: int = 0) -> list:
+    """The same comments as the API's ``textDisplay``, with a share of them split by ``<br>`` tags."""
+    rng = random.Random(seed)
+    out = []
+    for c in comments:
+        words = c.split(' ')
+        if len(words) > 4 and rng.random() < 0.3:
+            cut = rng.randint(1, len(words) - 1)
+            c = ' '.join(words[:cut]) + rng.choice(['<br>', '<br/>', '<BR />']) + ' '.join(words[cut:])
+        out.append(c)
+    return out
@@ -0,0 +1,376 @@
+"""Local stand-in for the Supabase PostgREST endpoints used by DBHandler.
+
+Implements table insert/upsert/select/delete with the filters DBHandler
+sends, plus the RPCs from ``migrations/``, on an in-memory SQLite database
+with a configurable per-request latency. Every request is counted so
+benchmarks can report round trips.
+"""
+import json, sqlite3, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+SCHEMA = '''
+create table videos (video_id text primary key, title text, link text);
+create table comments (
+    id integer primary key autoincrement, video_id text not null, comment_text text not null,
+    likes integer not null default 0, yt_comment_id text unique, published_at text, updated_at text,
+    multiplicity integer not null default 1, aliases text not null default '{}'
+);
+create index comments_video_id_idx on comments (video_id);
+create table sentiments (
+    id integer primary key autoincrement, comment_id integer not null unique,
+    sentiment_label text not null, sentiment_score real not null, subjectivity real
+);
+create table video_summaries (
+    video_id text primary key, total integer, counts text, tops text, hist text, tokens text, updated_at text
+);
+create table comment_load_rows (
+    load_id text, chunk integer, ord integer, yt_comment_id text, comment_text text, likes integer,
+    published_at text, updated_at text, sentiment_label text, sentiment_score real, subjectivity real,
+    multiplicity integer, aliases text not null default '{}', primary key (load_id, chunk, ord)
+);
+'''
+JSON_COLUMNS = {'counts', 'tops', 'hist', 'tokens', 'aliases'}
+ROW_KEYS = ['yt_comment_id', 'comment_text', 'likes', 'published_at', 'updated_at',
+            'sentiment_label', 'sentiment_score', 'subjectivity', 'multiplicity', 'aliases']
+RESERVED = {'select', 'order', 'offset', 'limit', 'on_conflict', 'columns'}
+
+def _literal(value: str):
+    return value[1:-1] if len(value) > 1 and value[0] == value[-1] == '"' else value
+
+def _where(params: list) -> tuple:
+    clauses, args = [], []
+    for col, expr in params:
+        if col in RESERVED:
+            continue
+        negate = expr.startswith('not.')
+        if negate:
+            expr = expr[4:]
+        op, _, value = expr.partition('.')
+        if op == 'eq':
+            clause = f'{col} = ?'
+            args.append(_literal(value))
+        elif op in ('gt', 'gte', 'lt', 'lte'):
+            clause = f"{col} {dict(gt='>', gte='>=', lt='<', lte='<=')[op]} ?"
+            args.append(_literal(value))
+        elif op == 'in':
+            items = [_literal(v) for v in value.strip('()').split(',') if v]
+            clause = f"{col} in ({','.join('?' * len(items))})"
+            args.extend(items)
+        elif op == 'is':
+            clause = f'{col} is null'
+        else:
+            raise ValueError(f'unsupported filter {col}={expr}')
+        clauses.append(f'not ({clause})' if negate else clause)
+    return (' where ' + ' and '.join(clauses) if clauses else ''), args
+
+class FakePostgREST:
+    """Usage: ``with FakePostgREST(latency=0.02) as pg: os.environ['SUPABASE_URL'] = pg.url``."""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.requests = 0
+        self.db = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self, 'GET')
+
+            def do_POST(self):
+                server._handle(self, 'POST')
+
+            def do_DELETE(self):
+                server._handle(self, 'DELETE')
+
+            def do_PATCH(self):
+                server._handle(self, 'PATCH')
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.key = 'fake-service-role-key-' + 'x' * 40
+
+    # -- table endpoints -------------------------------------------------
+
+    def _rows(self, cursor) -> list:
+        out = []
+        for r in cursor.fetchall():
+            row = dict(r)
+            for col in JSON_COLUMNS & row.keys():
+                if row[col] is not None:
+                    row[col] = json.loads(row[col])
+            out.append(row)
+        return out
+
+    def _insert(self, table: str, body, params: dict, prefer: str) -> list:
+        rows = body if isinstance(body, list) else [body]
+        conflict = params.get('on_conflict')
+        out = []
+        for row in rows:
+            row = {k: json.dumps(v) if k in JSON_COLUMNS else v for k, v in row.items()}
+            cols = list(row)
+            sql = f"insert into {table} ({','.join(cols)}) values ({','.join('?' * len(cols))})"
+            if conflict and 'merge-duplicates' in prefer:
+                updates = ','.join(f'{c} = excluded.{c}' for c in cols if c != conflict)
+                sql += f' on conflict ({conflict}) do update set {updates}'
+            out.extend(self._rows(self.db.execute(sql + ' returning *', [row[c] for c in cols])))
+        return out
+
+    def _select(self, table: str, params: list) -> list:
+        query = dict(params)
+        cols = query.get('select', '*').replace(' ', '') or '*'
+        where, args = _where(params)
+        sql = f'select {cols} from {table}{where}'
+        if 'order' in query:
+            col, _, direction = query['order'].partition('.')
+            sql += f" order by {col} {'desc' if direction.startswith('desc') else 'asc'}"
+        if 'limit' in query:
+            sql += f" limit {int(query['limit'])} offset {int(query.get('offset', 0))}"
+        return self._rows(self.db.execute(sql, args))
+
+    def _delete(self, table: str, params: list) -> list:
+        where, args = _where(params)
+        return self._rows(self.db.execute(f'delete from {table}{where} returning *', args))
+
+    # -- RPCs from migrations/ -------------------------------------------
+
+    def _insert_rows(self, video_id: str, rows: list) -> int:
+        for row in rows:
+            cur = self.db.execute(
+                'insert into comments (video_id, yt_comment_id, comment_text, likes, published_at, updated_at, '
+                'multiplicity, aliases) values (?, ?, ?, ?, ?, ?, ?, ?)',
+                [video_id, row.get('yt_comment_id'), row['comment_text'], row.get('likes', 0),
+                 row.get('published_at'), row.get('updated_at'), row.get('multiplicity') or 1,
+                 json.dumps(row.get('aliases') or {})]
+            )
+            self.db.execute(
+                'insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity) values (?, ?, ?, ?)',
+                [cur.lastrowid, row['sentiment_label'], row['sentiment_score'], row.get('subjectivity')]
+            )
+        return len(rows)
+
+    def _store_summary(self, video_id: str, summary: dict):
+        # upsert only the given columns, so a refresh keeps the stored tokens
+        cols = [c for c in ('total', 'counts', 'tops', 'hist', 'tokens') if c in summary]
+        self.db.execute(
+            f"insert into video_summaries (video_id, {','.join(cols)}, updated_at) "
+            f"values (?, {','.join('?' * len(cols))}, datetime('now')) on conflict (video_id) do update set "
+            + ', '.join(f'{c} = excluded.{c}' for c in cols + ['updated_at']),
+            [video_id] + [json.dumps(summary[c]) if c in JSON_COLUMNS else summary[c] for c in cols]
+        )
+
+    def rpc_replace_video_rows(self, p_video, p_rows, p_summary=None):
+        vid = p_video['video_id']
+        self.db.execute(
+            'insert into videos (video_id, title, link) values (?, ?, ?) '
+            'on conflict (video_id) do update set title = excluded.title, link = excluded.link',
+            [vid, p_video.get('title'), p_video.get('link')]
+        )
+        self.db.execute('delete from sentiments where comment_id in (select id from comments where video_id = ?)', [vid])
+        self.db.execute('delete from comments where video_id = ?', [vid])
+        n = self._insert_rows(vid, p_rows)
+        if p_summary is not None:
+            self._store_summary(vid, p_summary)
+        return n
+
+    def rpc_stage_video_rows(self, p_load_id, p_chunk, p_rows):
+        self.db.executemany(
+            f"insert into comment_load_rows (load_id, chunk, ord, {','.join(ROW_KEYS)}) "
+            f"values (?, ?, ?, {','.join('?' * len(ROW_KEYS))})",
+            [[p_load_id, p_chunk, i] + [json.dumps(r.get(k) or {}) if k in JSON_COLUMNS else r.get(k) for k in ROW_KEYS]
+             for i, r in enumerate(p_rows)]
+        )
+        return len(p_rows)
+
+    def rpc_commit_video_load(self, p_video, p_load_id, p_summary=None, p_repeats=None):
+        self.db.executemany(
+            'update comment_load_rows set multiplicity = coalesce(multiplicity, 1) + ?, likes = likes + ?, '
+            'aliases = json_patch(aliases, ?) where load_id = ? and yt_comment_id = ?',
+            [[r['multiplicity'], r['likes'], json.dumps(r.get('aliases') or {}), p_load_id, r['yt_comment_id']]
+             for r in p_repeats or []]
+        )
+        rows = self._rows(self.db.execute(
+            'select * from comment_load_rows where load_id = ? order by chunk, ord', [p_load_id]
+        ))
+        n = self.rpc_replace_video_rows(p_video, rows, p_summary)
+        self.db.execute('delete from comment_load_rows where load_id = ?', [p_load_id])
+        return n
+
+    def rpc_commit_video_update(self, p_video, p_load_id, p_repeats=None, p_tokens=None):
+        vid = p_video['video_id']
+        self.db.execute(
+            'insert into videos (video_id, title, link) values (?, ?, ?) '
+            'on conflict (video_id) do update set title = excluded.title, link = excluded.link',
+            [vid, p_video.get('title'), p_video.get('link')]
+        )
+        rows = self._rows(self.db.execute(
+            'select * from comment_load_rows where load_id = ? order by chunk, ord', [p_load_id]
+        ))
+        ids = {r['yt_comment_id'] for r in rows if r['yt_comment_id'] is not None}
+        for r in rows + (p_repeats or []):
+            ids.update(r.get('aliases') or {})
+        self.rpc_detach_video_comments(vid, sorted(ids))
+        n = self.rpc_upsert_video_comments(vid, rows)
+        if p_repeats is not None:
+            self.rpc_add_comment_repeats(vid, p_repeats)
+        self.rpc_refresh_video_summary(vid)
+        if p_tokens is not None:
+            self.rpc_merge_video_tokens(vid, p_tokens)
+        self.db.execute('delete from comment_load_rows where load_id = ?', [p_load_id])
+        return n
+
+    def rpc_abort_video_load(self, p_load_id):
+        self.db.execute('delete from comment_load_rows where load_id = ?', [p_load_id])
+
+    def rpc_detach_video_comments(self, p_video_id, p_ids):
+        ids, n = set(p_ids), 0
+        stored = self.db.execute(
+            'select id, yt_comment_id, updated_at, likes, multiplicity, aliases from comments where video_id = ?',
+            [p_video_id]
+        ).fetchall()
+        for cid, yid, updated, likes, mult, aliases in stored:
+            aliases = json.loads(aliases)
+            gone = [a for a in aliases if a in ids]
+            if not gone and yid not in ids:
+                continue
+            n += 1
+            likes -= sum(aliases.pop(a)['likes'] for a in gone)
+            mult -= len(gone)
+            if yid in ids:
+                if not aliases:
+                    self.db.execute('delete from sentiments where comment_id = ?', [cid])
+                    self.db.execute('delete from comments where id = ?', [cid])
+                    continue
+                # the row's own comment is stored again: a copy takes over its text and score
+                heir = min(aliases)
+                likes, mult = sum(a['likes'] for a in aliases.values()), mult - 1
+                yid, updated = heir, aliases.pop(heir)['updated_at']
+            self.db.execute(
+                'update comments set yt_comment_id = ?, updated_at = ?, likes = ?, multiplicity = ?, aliases = ? '
+                'where id = ?', [yid, updated, likes, mult, json.dumps(aliases), cid]
+            )
+        return n
+
+    def rpc_upsert_video_comments(self, p_video_id, p_rows):
+        for row in p_rows:
+            cur = self.db.execute(
+                'insert into comments (video_id, yt_comment_id, comment_text, likes, published_at, updated_at, '
+                'multiplicity, aliases) values (?, ?, ?, ?, ?, ?, ?, ?) on conflict (yt_comment_id) do update set '
+                'comment_text = excluded.comment_text, likes = excluded.likes, updated_at = excluded.updated_at, '
+                'aliases = json_patch(comments.aliases, excluded.aliases) returning id',
+                [p_video_id, row['yt_comment_id'], row['comment_text'], row.get('likes', 0),
+                 row.get('published_at'), row.get('updated_at'), row.get('multiplicity') or 1,
+                 json.dumps(row.get('aliases') or {})]
+            )
+            self.db.execute(
+                'insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity) '
+                'values (?, ?, ?, ?) on conflict (comment_id) do update set '
+                'sentiment_label = excluded.sentiment_label, sentiment_score = excluded.sentiment_score, '
+                'subjectivity = excluded.subjectivity',
+                [cur.fetchone()[0], row['sentiment_label'], row['sentiment_score'], row.get('subjectivity')]
+            )
+        return len(p_rows)
+
+    def rpc_add_comment_repeats(self, p_video_id, p_repeats):
+        return sum(self.db.execute(
+            'update comments set multiplicity = multiplicity + ?, likes = likes + ?, aliases = json_patch(aliases, ?) '
+            'where video_id = ? and yt_comment_id = ?',
+            [r['multiplicity'], r['likes'], json.dumps(r.get('aliases') or {}), p_video_id, r['yt_comment_id']]
+        ).rowcount for r in p_repeats)
+
+    def rpc_video_analysis_page(self, p_video_id, p_after=0, p_limit=1000):
+        rows = self.db.execute(
+            'select c.id, c.comment_text, c.likes, s.sentiment_label, s.sentiment_score, s.subjectivity, '
+            'c.multiplicity from comments c join sentiments s on s.comment_id = c.id '
+            'where c.video_id = ? and c.id > ? order by c.id limit ?',
+            [p_video_id, p_after, p_limit]
+        ).fetchall()
+        names = ['ids', 'comments', 'likes', 'labels', 'scores', 'subjectivities', 'multiplicities']
+        return {name: [r[i] for r in rows] for i, name in enumerate(names)}
+
+    def rpc_video_comment_rows_page(self, p_video_id, p_after=0, p_limit=1000):
+        return self._rows(self.db.execute(
+            'select c.id, c.yt_comment_id, c.comment_text, c.likes, c.published_at, c.updated_at, '
+            's.sentiment_label, s.sentiment_score, s.subjectivity, c.multiplicity '
+            'from comments c join sentiments s on s.comment_id = c.id '
+            'where c.video_id = ? and c.id > ? order by c.id limit ?',
+            [p_video_id, p_after, p_limit]
+        ))
+
+    def rpc_refresh_video_summary(self, p_video_id):
+        from sentiment_service import SentimentAggregate, SentimentBatch
+        rows = self.db.execute(
+            'select c.comment_text, s.sentiment_score, c.multiplicity from comments c '
+            'join sentiments s on s.comment_id = c.id where c.video_id = ? order by c.id', [p_video_id]
+        ).fetchall()
+        agg = SentimentAggregate(max_rows=0)
+        agg.update(SentimentBatch([r[0] for r in rows], [r[1] for r in rows], multiplicities=[r[2] for r in rows]))
+        summary = agg.to_summary()
+        del summary['tokens']
+        self._store_summary(p_video_id, summary)
+
+    def rpc_merge_video_tokens(self, p_video_id, p_tokens, p_limit=2000):
+        from sentiment_service import SentimentAggregate
+        row = self.db.execute('select tokens from video_summaries where video_id = ?', [p_video_id]).fetchone()
+        if row is None or row[0] is None:
+            return
+        agg = SentimentAggregate(max_rows=0)
+        agg.merge_tokens(json.loads(row[0]))
+        agg.merge_tokens(p_tokens)
+        self._store_summary(p_video_id, {'tokens': agg.token_summary(p_limit)})
+
+    # -- HTTP ------------------------------------------------------------
+
+    def _handle(self, req: BaseHTTPRequestHandler, method: str):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        url = urlparse(req.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        length = int(req.headers.get('Content-Length') or 0)
+        body = json.loads(req.rfile.read(length)) if length else None
+        path = url.path.split('/rest/v1/', 1)[-1]
+        status = 200
+        try:
+            with self._lock:
+                self.db.execute('begin')
+                try:
+                    if path.startswith('rpc/'):
+                        result = getattr(self, 'rpc_' + path[4:])(**(body or {}))
+                    elif method == 'POST':
+                        result = self._insert(path, body, dict(params), req.headers.get('Prefer', ''))
+                        status = 201
+                    elif method == 'GET':
+                        result = self._select(path, params)
+                    elif method == 'DELETE':
+                        result = self._delete(path, params)
+                    else:
+                        raise ValueError(f'unsupported method {method}')
+                    self.db.execute('commit')
+                except Exception:
+                    self.db.execute('rollback')
+                    raise
+        except Exception as e:
+            status, result = 400, {'message': str(e), 'code': 'FAKE', 'hint': None, 'details': None}
+        data = json.dumps(result).encode('utf-8')
+        req.send_response(status)
+        req.send_header('Content-Type', 'application/json')
+        req.send_header('Content-Length', str(len(data)))
+        req.end_headers()
+        req.wfile.write(data)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
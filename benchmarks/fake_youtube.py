@@ -0,0 +1,122 @@
+"""Local stand-in for the YouTube Data API v3 endpoints used by YouTubeClient.
+
+Serves ``/videos``, ``/playlistItems``, ``/commentThreads`` and ``/comments`` from a seeded
+synthetic corpus with configurable per-request latency and injected 429s.
+"""
+import json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from benchmarks.corpus import make_corpus
+
+def _comment(cid: str, text: str, likes: int, published: str) -> dict:
+    return {
+        'id': cid,
+        'snippet': {
+            'textDisplay': text.replace('\n', '<br>'), 'likeCount': likes,
+            'publishedAt': published, 'updatedAt': published,
+        }
+    }
+
+def _for_video(video_id: str, comment: dict) -> dict:
+    return {**comment, 'id': f"{video_id}-{comment['id']}"}
+
+class FakeYouTubeServer:
+    """Usage: ``with FakeYouTubeServer(n_comments=5000) as yt: YouTubeClient('k', base_url=yt.url)``.
+
+    Every video id serves the same ``n_comments`` threads, newest first, each
+    with ``replies_per_thread`` replies of which the first five are embedded.
+    Comment ids are prefixed with the video id, so they are unique across videos
+    as YouTube's are: ``<video_id>-c0000000``, ``<video_id>-c0000000.r0``, ...
+    Every playlist lists ``playlist_size`` videos ``v0000000000``, ...
+    Every ``throttle_every``-th request answers 429. ``floods`` is passed to ``make_corpus``.
+    """
+
+    def __init__(self, n_comments: int = 5000, replies_per_thread: int = 0, latency: float = 0.05,
+                 throttle_every: int = 0, seed: int = 0, playlist_size: int = 50, floods: float = 0.0):
+        self.latency = latency
+        self.playlist = [{'contentDetails': {'videoId': f'v{i:010d}'}} for i in range(playlist_size)]
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        rng = random.Random(seed)
+        texts = make_corpus(n_comments * (1 + replies_per_thread), seed, floods=floods)
+        self.threads = []
+        for i in range(n_comments):
+            published = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1700000000 - i * 60))
+            top = _comment(f'c{i:07d}', texts[i], rng.randint(0, 500), published)
+            replies = [
+                _comment(f'c{i:07d}.r{j}', texts[n_comments + i * replies_per_thread + j], rng.randint(0, 50), published)
+                for j in range(replies_per_thread)
+            ]
+            self.threads.append((top, replies))
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def _page(self, items: list, query: dict, render=None) -> dict:
+        size = min(int(query.get('maxResults', ['20'])[0]), 100)
+        start = int(query.get('pageToken', ['0'])[0] or 0)
+        page = items[start:start+size]
+        body = {'items': [render(i) for i in page] if render else page}
+        if start + size < len(items):
+            body['nextPageToken'] = str(start + size)
+        return body
+
+    def _handle(self, req: BaseHTTPRequestHandler):
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        time.sleep(self.latency)
+        url = urlparse(req.path)
+        query = parse_qs(url.query)
+        status, body = 200, None
+        if self.throttle_every and n % self.throttle_every == 0:
+            status = 429
+            body = {'error': {'code': 429, 'message': 'Too many requests',
+                              'errors': [{'reason': 'rateLimitExceeded'}]}}
+        elif url.path.endswith('/videos'):
+            vid = query.get('id', [''])[0]
+            body = {'items': [{'id': vid, 'snippet': {'title': f'Fake video {vid}'}}]}
+        elif url.path.endswith('/playlistItems'):
+            body = self._page(self.playlist, query)
+        elif url.path.endswith('/commentThreads'):
+            with_replies = 'replies' in query.get('part', [''])[0]
+            vid = query.get('videoId', [''])[0]
+            def render(entry):
+                top, replies = _for_video(vid, entry[0]), [_for_video(vid, r) for r in entry[1]]
+                thread = {'id': top['id'], 'snippet': {'topLevelComment': top, 'totalReplyCount': len(replies)}}
+                if with_replies and replies:
+                    thread['replies'] = {'comments': replies[:5]}
+                return thread
+            body = self._page(self.threads, query, render)
+        elif url.path.endswith('/comments'):
+            vid, _, parent = query.get('parentId', [''])[0].rpartition('-')
+            index = int(parent[1:]) if parent[1:].isdigit() else -1
+            replies = self.threads[index][1] if 0 <= index < len(self.threads) else []
+            body = self._page(replies, query, lambda r: _for_video(vid, r))
+        else:
+            status, body = 404, {'error': {'code': 404, 'message': 'Not found', 'errors': [{'reason': 'notFound'}]}}
+        data = json.dumps(body).encode('utf-8')
+        req.send_response(status)
+        req.send_header('Content-Type', 'application/json')
+        req.send_header('Content-Length', str(len(data)))
+        req.end_headers()
+        req.wfile.write(data)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,330 @@
+"""Benchmark suite over the pipeline's hot paths at several corpus sizes.
+
+Every benchmark runs on a seeded synthetic corpus (prose, emoji, memes, spam,
+10% verbatim duplicates and optionally bot-flood variants), with the fake YouTube and PostgREST servers
+standing in for the network. Results are written as JSON so runs can be
+compared across commits:
+
+    python -m benchmarks.suite --out before.json
+    python -m benchmarks.suite --out after.json --compare before.json
+
+Options: --sizes 1000,10000,100000  --only filter,score  --repeat 3  --latency 0.005
+         --backend vader|vectorized  --floods 0.3
+"""
+import argparse, json, os, platform, subprocess, time
+from benchmarks.corpus import make_corpus, to_html
+
+SIZES = (1000, 10000, 100000)
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+def best_of(fn, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {'seconds': min(runs), 'runs': [round(r, 5) for r in runs]}
+
+@benchmark('filter.is_spam')
+def bench_is_spam(corpus: list, opts) -> dict:
+    from comment_filter import CommentFilter
+    cf = CommentFilter()
+    spam = sum(map(cf.is_spam, corpus))
+    return {**best_of(lambda: [cf.is_spam(c) for c in corpus], opts.repeat), 'spam': spam}
+
+@benchmark('text.sanitize_text')
+def bench_sanitize(corpus: list, opts) -> dict:
+    from youtube_client import sanitize_text
+    html = to_html(corpus, opts.seed)
+    return best_of(lambda: [sanitize_text(c) for c in html], opts.repeat)
+
+@benchmark('service.score')
+def bench_score(corpus: list, opts) -> dict:
+    from sentiment_service import SentimentService
+    sent = SentimentService()
+    return best_of(lambda: [sent.score(c) for c in corpus], opts.repeat)
+
+@benchmark('vader.vectorized')
+def bench_vectorized(corpus: list, opts) -> dict:
+    from vader_vectorized import VectorizedVader
+    fast = VectorizedVader()
+    fast.compound(corpus[:100])
+    return best_of(lambda: fast.compound(corpus), opts.repeat)
+
+@benchmark('service.classify_counts')
+def bench_classify_counts(corpus: list, opts) -> dict:
+    from sentiment_service import SentimentService
+    from scoring_engine import ScoringEngine
+    sent = SentimentService(engine=ScoringEngine(workers=opts.workers, backend=opts.backend))
+    try:
+        sent.classify_counts(corpus[:100])  # start the worker pool outside the timing
+        # scored from scratch each run; a list passed directly would be answered from the kept batch
+        return best_of(lambda: sent.classify_counts(sent.analyze_batch(corpus)), opts.repeat)
+    finally:
+        sent.engine.close()
+
+@benchmark('service.top_comments')
+def bench_top_comments(corpus: list, opts) -> dict:
+    from sentiment_service import SentimentService
+    from scoring_engine import ScoringEngine
+    sent = SentimentService(engine=ScoringEngine(workers=opts.workers, backend=opts.backend))
+    try:
+        sent.top_comments(corpus[:100])
+        # scored from scratch each run; a list passed directly would be answered from the kept batch
+        return best_of(lambda: sent.top_comments(sent.analyze_batch(corpus)), opts.repeat)
+    finally:
+        sent.engine.close()
+
+@benchmark('service.analyze_batch_cached')
+def bench_analyze_cached(corpus: list, opts) -> dict:
+    # second pass over the same comments: everything comes from the in-memory cache
+    from sentiment_service import SentimentService
+    from sentiment_cache import SentimentCache
+    from scoring_engine import ScoringEngine
+    sent = SentimentService(engine=ScoringEngine(workers=opts.workers, backend=opts.backend), cache=SentimentCache(maxsize=len(corpus)))
+    try:
+        sent.analyze_batch(corpus, subjectivity=True)
+        return {**best_of(lambda: sent.analyze_batch(corpus, subjectivity=True), opts.repeat),
+                'hit_rate': round(sent.cache.hit_rate, 4)}
+    finally:
+        sent.engine.close()
+
+@benchmark('render.wordcloud')
+def bench_wordcloud(corpus: list, opts) -> dict:
+    from wordcloud import WordCloud, STOPWORDS
+    render = lambda: WordCloud(
+        width=800, height=400, background_color='black', max_words=200, stopwords=STOPWORDS,
+        colormap='plasma', contour_width=1, contour_color='white', random_state=opts.seed
+    ).generate(' '.join(corpus)).to_array()
+    return best_of(render, opts.repeat)
+
+@benchmark('dedup.collapse')
+def bench_collapse(corpus: list, opts) -> dict:
+    from dedup import DuplicateIndex
+    from youtube_client import Comment
+    rows = [Comment(t, 1, str(i), None, None) for i, t in enumerate(corpus)]
+    indexes = []
+    def collapse():
+        indexes.append(DuplicateIndex())
+        for i in range(0, len(rows), 100):
+            indexes[-1].collapse(rows[i:i+100])
+    return {**best_of(collapse, opts.repeat), 'groups': len(indexes[-1])}
+
+@benchmark('service.analyze_groups')
+def bench_analyze_groups(corpus: list, opts) -> dict:
+    # collapse then score each group once; compare with service.classify_counts
+    from dedup import DuplicateIndex
+    from youtube_client import Comment
+    from sentiment_service import SentimentService
+    from scoring_engine import ScoringEngine
+    rows = [Comment(t, 1, str(i), None, None) for i, t in enumerate(corpus)]
+    sent = SentimentService(engine=ScoringEngine(workers=opts.workers, backend=opts.backend))
+    def analyze():
+        groups = DuplicateIndex().collapse(rows)
+        return sent.analyze_groups(groups, [g.comment.text for g in groups])
+    try:
+        sent.classify_counts(corpus[:100])
+        return {**best_of(analyze, opts.repeat), 'groups': len(analyze())}
+    finally:
+        sent.engine.close()
+
+@benchmark('service.token_index')
+def bench_token_index(corpus: list, opts) -> dict:
+    # built page by page during analysis, as the app does
+    from sentiment_service import SentimentAggregate, SentimentBatch
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(len(corpus))]
+    pages = [SentimentBatch(corpus[i:i+100], scores[i:i+100]) for i in range(0, len(corpus), 100)]
+    def build():
+        agg = SentimentAggregate(max_rows=0)
+        for page in pages:
+            agg.add_tokens(page)
+    return best_of(build, opts.repeat)
+
+@benchmark('render.wordcloud_frequencies')
+def bench_wordcloud_frequencies(corpus: list, opts) -> dict:
+    # a rerun's word cloud drawn from the token index instead of the joined text
+    from wordcloud import WordCloud, STOPWORDS
+    from sentiment_service import SentimentAggregate, SentimentBatch
+    agg = SentimentAggregate(max_rows=0)
+    agg.add_tokens(SentimentBatch(corpus, [0.0] * len(corpus)))
+    render = lambda: WordCloud(
+        width=800, height=400, background_color='black', max_words=200,
+        colormap='plasma', contour_width=1, contour_color='white', random_state=opts.seed
+    ).generate_from_frequencies(agg.word_frequencies(stopwords=STOPWORDS)).to_array()
+    return best_of(render, opts.repeat)
+
+@benchmark('render.chart_data')
+def bench_chart_data(corpus: list, opts) -> dict:
+    # scatter points and one table page over every row, not just the app's reservoir sample;
+    # bytes is the size of the data the browser gets, which should not grow with n
+    from chart_data import scatter_frame, table_frame, table_page
+    from sentiment_service import label_for
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(len(corpus))]
+    rows = {'comments': corpus, 'likes': list(range(len(corpus))), 'scores': scores,
+            'labels': [label_for(s) for s in scores], 'subjectivities': [0.5] * len(corpus)}
+    def prepare():
+        return scatter_frame(rows), table_page(table_frame(rows), 1)
+    points, page = prepare()
+    size = len(points.to_json(orient='records')) + len(page.data.to_json(orient='records'))
+    return {**best_of(prepare, opts.repeat), 'points': len(points), 'bytes': size}
+
+def _result_rows(corpus: list) -> list:
+    from db_handler import comment_rows
+    from sentiment_service import label_for
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(len(corpus))]
+    stamps = ['2024-01-01T00:00:00Z'] * len(corpus)
+    return comment_rows(corpus, list(range(len(corpus))), [str(i) for i in range(len(corpus))], stamps, stamps,
+                        [label_for(s) for s in scores], scores, [0.5] * len(corpus))
+
+@benchmark('store.write')
+def bench_store_write(corpus: list, opts) -> dict:
+    import tempfile
+    from result_store import ResultStore
+    rows = _result_rows(corpus)
+    with tempfile.TemporaryDirectory() as root:
+        store = ResultStore(root)
+        def write():
+            # added in API-page-sized pieces, as an analysis streams them
+            export = store.begin('v0000000000', 'title', 'link')
+            for i in range(0, len(rows), 100):
+                export.add(rows[i:i+100])
+            export.commit()
+        result = best_of(write, opts.repeat)
+        return {**result, 'bytes': os.path.getsize(store.path('v0000000000'))}
+
+@benchmark('store.read_columns')
+def bench_store_read_columns(corpus: list, opts) -> dict:
+    # labels and likes of the corpus split over 10 video files, memory-mapped
+    import tempfile
+    from result_store import ResultStore
+    rows = _result_rows(corpus)
+    with tempfile.TemporaryDirectory() as root:
+        store = ResultStore(root)
+        step = -(-len(rows) // 10)
+        for v, i in enumerate(range(0, len(rows), step)):
+            export = store.begin(f'v{v:010d}', 'title', 'link')
+            export.add(rows[i:i+step])
+            export.commit()
+        return best_of(lambda: store.read(columns=['video_id', 'sentiment_label', 'likes']), opts.repeat)
+
+@benchmark('youtube.get_comments')
+def bench_get_comments(corpus: list, opts) -> dict:
+    from comment_filter import CommentFilter
+    from youtube_client import YouTubeClient
+    from benchmarks.fake_youtube import FakeYouTubeServer
+    cf = CommentFilter()
+    with FakeYouTubeServer(n_comments=len(corpus), latency=opts.latency, seed=opts.seed) as yt:
+        client = YouTubeClient('k', base_url=yt.url)
+        try:
+            fetched = []
+            result = best_of(lambda: fetched.append(client.get_comments('vid00000000', cf, max_comments=len(corpus))),
+                             opts.repeat)
+        finally:
+            client.close()
+        return {**result, 'kept': len(fetched[-1]), 'requests': yt.requests // opts.repeat}
+
+@benchmark('db.insert_batches')
+def bench_insert_batches(corpus: list, opts) -> dict:
+    from benchmarks.fake_postgrest import FakePostgREST
+    n = len(corpus)
+    likes = list(range(n))
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(n)]
+    labels = ['Positive' if s >= 0.05 else 'Negative' if s <= -0.05 else 'Neutral' for s in scores]
+    with FakePostgREST(latency=opts.latency) as pg:
+        os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'] = pg.url, pg.key
+        from db_handler import DBHandler
+        db = DBHandler()
+        runs = iter(range(opts.repeat))
+        def insert():
+            vid = f'vid{next(runs):08d}'
+            yt_ids = [f'{vid}.{i}' for i in range(n)]
+            ids = db.insert_comments_batch(vid, corpus, likes, yt_ids=yt_ids)
+            db.insert_sentiments_batch(ids, labels, scores)
+        return {**best_of(insert, opts.repeat), 'requests': pg.requests // opts.repeat}
+
+@benchmark('db.bulk_load')
+def bench_bulk_load(corpus: list, opts) -> dict:
+    from benchmarks.fake_postgrest import FakePostgREST
+    n = len(corpus)
+    likes = list(range(n))
+    scores = [((i * 37) % 200 - 100) / 100 for i in range(n)]
+    labels = ['Positive' if s >= 0.05 else 'Negative' if s <= -0.05 else 'Neutral' for s in scores]
+    with FakePostgREST(latency=opts.latency) as pg:
+        os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'] = pg.url, pg.key
+        from db_handler import DBHandler, comment_rows
+        db = DBHandler()
+        runs = iter(range(opts.repeat))
+        def load():
+            vid = f'vid{next(runs):08d}'
+            rows = comment_rows(corpus, likes, [f'{vid}.{i}' for i in range(n)], None, None, labels, scores)
+            bulk = db.begin_load(vid, 'Fake', f'https://youtu.be/{vid}')
+            # pages of 100, as they arrive from YouTube
+            for i in range(0, n, 100):
+                bulk.add(rows[i:i+100])
+            bulk.commit()
+        return {**best_of(load, opts.repeat), 'requests': pg.requests // opts.repeat}
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+        'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r['benchmark'], r['n']): r for r in baseline['results']}
+    print(f"\nvs {baseline_path} (commit {baseline['environment'].get('commit')})")
+    matched = [(r, before[(r['benchmark'], r['n'])]) for r in results if (r['benchmark'], r['n']) in before]
+    if not matched:
+        print('no benchmark/size pairs in common')
+    for r, old in matched:
+        ratio = old['seconds'] / r['seconds'] if r['seconds'] else float('inf')
+        print(f"{r['benchmark']:<30} {r['n']:>7} {old['seconds']:>9.4f}s -> {r['seconds']:>9.4f}s  {ratio:>6.2f}x")
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite.')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated corpus sizes')
+    parser.add_argument('--only', default='', help='comma-separated benchmark name prefixes')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark; the best is reported')
+    parser.add_argument('--latency', type=float, default=0.005, help='fake server latency per request (s)')
+    parser.add_argument('--workers', type=int, default=None, help='ScoringEngine processes')
+    parser.add_argument('--backend', default='vader', help='ScoringEngine backend: vader or vectorized')
+    parser.add_argument('--floods', type=float, default=0.0, help='share of bot-flood comment variants')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    opts = parser.parse_args(argv)
+    sizes = [int(s) for s in opts.sizes.split(',')]
+    prefixes = [p for p in opts.only.split(',') if p]
+    names = [name for name in BENCHMARKS if not prefixes or any(name.startswith(p) for p in prefixes)]
+    results = []
+    print(f'{"benchmark":<30} {"n":>7} {"seconds":>10} {"items/s":>11}')
+    for n in sizes:
+        corpus = make_corpus(n, opts.seed, duplicates=0.1, floods=opts.floods)
+        for name in names:
+            result = BENCHMARKS[name](corpus, opts)
+            result = {'benchmark': name, 'n': n, 'items_per_s': round(n / result['seconds'], 1), **result}
+            result['seconds'] = round(result['seconds'], 5)
+            results.append(result)
+            print(f"{name:<30} {n:>7} {result['seconds']:>10.4f} {result['items_per_s']:>11.0f}", flush=True)
+    report = {'environment': environment(), 'options': vars(opts), 'results': results}
+    with open(opts.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'results written to {opts.out}')
+    if opts.compare:
+        compare(results, opts.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Bounded data for the dashboard's charts and comment table.
+
+Whatever the number of comments, each chart gets a fixed-size payload: the
+histogram its pre-aggregated bins, the scatter plot a label-stratified
+sample of at most ``MAX_POINTS`` points with tooltips cut to
+``TOOLTIP_CHARS`` characters, and the table one page of ``PAGE_SIZE`` rows.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 1500
+TOOLTIP_CHARS = 80
+PAGE_SIZE = 100
+
+def histogram_frame(agg) -> pd.DataFrame:
+    """One row per histogram bin of the aggregate: start, end and count."""
+    edges = agg.hist_edges
+    return pd.DataFrame({'Score': edges[:-1], 'Score_end': edges[1:], 'Count': agg.hist})
+
+def truncate(texts: list, limit: int = TOOLTIP_CHARS) -> list:
+    return [t if len(t) <= limit else t[:limit - 1].rstrip() + '…' for t in texts]
+
+def stratified_sample(labels: list, max_points: int = MAX_POINTS, seed: int = 0) -> np.ndarray:
+    """Sorted indices of at most ``max_points`` rows, each label keeping its share.
+
+    A label present in the rows keeps at least one point, so rare negatives
+    stay visible next to a flood of positives. The seed is fixed so the
+    chart does not reshuffle on every rerun.
+    """
+    labels = np.asarray(labels)
+    if len(labels) <= max_points:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    keep = []
+    for lbl in np.unique(labels):
+        idx = np.flatnonzero(labels == lbl)
+        k = max(1, round(max_points * len(idx) / len(labels)))
+        keep.append(rng.choice(idx, min(k, len(idx)), replace=False))
+    return np.sort(np.concatenate(keep))
+
+def scatter_frame(rows: dict, fill=None, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """Sentiment against subjectivity for a stratified sample of ``rows`` (``SentimentAggregate.columns()``).
+
+    ``fill(text)``, when given, supplies the subjectivity of sampled rows that have none.
+    """
+    idx = stratified_sample(rows['labels'], max_points)
+    pick = lambda col: [col[i] for i in idx]
+    comments, subjects = pick(rows['comments']), pick(rows['subjectivities'])
+    if fill is not None:
+        subjects = [fill(c) if s is None else s for c, s in zip(comments, subjects)]
+    return pd.DataFrame({
+        'Sentiment': pick(rows['scores']),
+        'Subjectivity': pd.array(subjects, dtype='Float64'),
+        'Comment': truncate(comments),
+        'Label': pick(rows['labels']),
+    })
+
+def table_frame(rows: dict) -> pd.DataFrame:
+    """The sampled rows as the comment table, most liked first, with a colour per score."""
+    scores = np.asarray(rows['scores'], dtype=float)
+    df = pd.DataFrame({
+        'Comment': rows['comments'],
+        'Likes': rows['likes'],
+        'Sentiment Score': scores,
+        'Label': np.select([scores > 0.5, scores < -0.5], ['Positive', 'Negative'], 'Neutral'),
+        'Color': np.select([scores > 0.5, scores < -0.5], ['color: green', 'color: red'], 'color: grey'),
+    })
+    return df.sort_values('Likes', ascending=False, kind='stable', ignore_index=True)
+
+def page_count(df: pd.DataFrame, page_size: int = PAGE_SIZE) -> int:
+    return max(1, -(-len(df) // page_size))
+
+def table_page(df: pd.DataFrame, page: int, page_size: int = PAGE_SIZE):
+    """Page ``page`` (1-based) of ``table_frame`` output as a Styler, scores coloured from the Color column."""
+    part = df.iloc[(page - 1) * page_size:page * page_size]
+    shown = part.drop(columns='Color')
+    css = pd.DataFrame('', index=shown.index, columns=shown.columns)
+    css['Sentiment Score'] = part['Color']
+    return shown.style.apply(lambda _: css, axis=None)
@@ -1,5 +1,46 @@
 import re
 
+_GLOBAL_FLAGS_RE = re.compile(r'^\(\?([aiLmsux]+)\)')
+# group references: \1, (?P=name) and (?(1)...); an escaped backslash may match too, which is harmless
+_GROUP_REF_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+def _split_flags(pat: str) -> tuple:
+    m = _GLOBAL_FLAGS_RE.match(pat)
+    return (m.group(1), pat[m.end():]) if m else ('', pat)
+
+def _alternation(parts: list, flags: str = ''):
+    if not parts:
+        return None
+    return re.compile((f'(?{flags})' if flags else '') + '|'.join(f'(?:{p})' for p in parts))
+
+def compile_rules(patterns: list) -> tuple:
+    """Merge regex patterns into precompiled alternations.
+
+    Returns ``(full, caseless, rest, alone)``. ``full`` holds every pattern
+    that can share an alternation, with leading inline flags such as ``(?i)``
+    rewritten as scoped groups, and is exact for any text. For ASCII text,
+    ``caseless`` (the plain ``(?i)`` patterns, matched against lowercased
+    text without IGNORECASE, which is much cheaper in ``re``) together with
+    ``rest`` gives the same answer. ``alone`` lists the patterns compiled on
+    their own: those with named groups or group references, whose numbering
+    and names an alternation would change. Raises ``re.error`` naming the
+    first invalid pattern.
+    """
+    full, caseless, rest, alone = [], [], [], []
+    for pat in patterns:
+        compiled = re.compile(pat)
+        flags, body = _split_flags(pat)
+        if compiled.groupindex or _GROUP_REF_RE.search(body):
+            alone.append(compiled)
+            continue
+        full.append(f'(?{flags}:{body})' if flags else body)
+        # lowercase-only bodies without class ranges fold exactly for ASCII
+        if flags == 'i' and body == body.lower() and not ('[' in body and '-' in body):
+            caseless.append(body)
+        else:
+            rest.append(full[-1])
+    return _alternation(full), _alternation(caseless), _alternation(rest), alone
+
 class CommentFilter:
     SPAM_PATTERNS = [
         r'(?i)check (out|my) (channel|profile)', r'(?i)subscribe (to|my)',
@@ -13,18 +54,52 @@ class CommentFilter:
         r'\U00002600-\U000026FF\U00002B50\U00002B06'
         r'\U0001F004\U0001F0CF\U0001F170-\U0001F251]'
     )
+    MAX_WORDS = 200
+    MAX_EMOJI_RATIO = 0.6
 
-    def is_spam(self, comment: str) -> bool:
-        if len(comment.split()) >= 200:
+    def __init__(self):
+        self.rule_sets = {'default': list(self.SPAM_PATTERNS)}
+        self._compile()
+
+    def _compile(self):
+        patterns = [p for pats in self.rule_sets.values() for p in pats]
+        self._rules_re, self._caseless_re, self._rest_re, self._alone = compile_rules(patterns)
+
+    def register_rules(self, name: str, patterns: list):
+        """Add (or replace) a named rule set; see ``compile_rules``. An invalid pattern raises ``re.error``."""
+        compile_rules(patterns)
+        self.rule_sets[name] = list(patterns)
+        self._compile()
+
+    def remove_rules(self, name: str):
+        self.rule_sets.pop(name, None)
+        self._compile()
+
+    def _matches_rules(self, comment: str) -> bool:
+        if any(p.search(comment) for p in self._alone):
             return True
-        if re.fullmatch(r'^(?:\s|' + self.EMOJI_RE.pattern + r')+?$', comment):
+        if not comment.isascii():
+            return self._rules_re is not None and self._rules_re.search(comment) is not None
+        if self._caseless_re is not None and self._caseless_re.search(comment.lower()):
             return True
-        no_space = comment.replace(' ', '')
-        if no_space:
-            emo_cnt = len(self.EMOJI_RE.findall(no_space))
-            if emo_cnt / len(no_space) >= 0.6:
+        return self._rest_re is not None and self._rest_re.search(comment) is not None
+
+    def is_spam(self, comment: str) -> bool:
+        # one split gives both the word count and the non-whitespace length
+        words = comment.split()
+        if len(words) >= self.MAX_WORDS:
+            return True
+        if comment:
+            emo_cnt = len(self.EMOJI_RE.findall(comment))
+            # only whitespace and emoji
+            if emo_cnt == sum(map(len, words)):
                 return True
-        for pat in self.SPAM_PATTERNS:
-            if re.search(pat, comment):
+            no_space = len(comment) - comment.count(' ')
+            if emo_cnt / no_space >= self.MAX_EMOJI_RATIO:
                 return True
-        return False
\ No newline at end of file
+        return self._matches_rules(comment)
+
+    def filter_many(self, comments: list) -> list:
+        """Return the comments that are not spam, in order."""
+        is_spam = self.is_spam
+        return [c for c in comments if not is_spam(c)]
@@ -1,5 +1,130 @@
-import os
-from supabase import create_client, Client
+import os, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from instrumentation import stage, submit
+
+def _yt_timestamp(value: str) -> str:
+    # Postgres renders timestamptz as '...+00:00'; YouTube sends '...Z'
+    if not value:
+        return value
+    return datetime.fromisoformat(value).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def comment_rows(comments: list, likes: list, yt_ids: list, published: list, updated: list,
+                 labels: list, scores: list, subjectivities: list = None, multiplicities: list = None,
+                 aliases: list = None) -> list:
+    """Build the comment-with-sentiment rows taken by the bulk write RPCs."""
+    none = [None] * len(comments)
+    return [
+        {'yt_comment_id': yid, 'comment_text': txt, 'likes': lk, 'published_at': pub,
+         'updated_at': upd, 'sentiment_label': lbl, 'sentiment_score': sc, 'subjectivity': subj,
+         'multiplicity': m, 'aliases': al}
+        for txt, lk, yid, pub, upd, lbl, sc, subj, m, al in zip(
+            comments, likes, yt_ids or none, published or none, updated or none,
+            labels, scores, subjectivities or none, multiplicities or [1] * len(comments), aliases or none
+        )
+    ]
+
+def group_rows(groups: list, batch) -> tuple:
+    """Split a scored page of duplicate groups (see ``dedup``) into new comment rows and repeat rows."""
+    new = [i for i, g in enumerate(groups) if not g.repeat]
+    pick = lambda col: [col[i] for i in new] if col is not None else None
+    reps = [groups[i].comment for i in new]
+    rows = comment_rows(
+        pick(batch.comments), [c.likes for c in reps], [c.comment_id for c in reps],
+        [c.published_at for c in reps], [c.updated_at for c in reps],
+        pick(batch.labels), pick(batch.scores), pick(batch.subjectivities), pick(batch.multiplicities),
+        [groups[i].aliases for i in new]
+    )
+    repeats = [
+        {'yt_comment_id': g.comment.comment_id, 'multiplicity': g.multiplicity, 'likes': g.comment.likes,
+         'aliases': g.aliases}
+        for g in groups if g.repeat
+    ]
+    return rows, repeats
+
+class BulkLoad:
+    """
+    Staged, atomic replace of one video's analysis.
+
+    Rows passed to ``add`` are uploaded in chunks on a thread pool while the
+    caller keeps working; ``commit`` waits for them and swaps everything in
+    with one transaction, so readers never see a half-written video.
+    Duplicate copies of rows already added are collected with ``add_repeats``
+    and applied in the same transaction. ``commit_update`` instead merges
+    the rows of an incremental run into the stored ones.
+    """
+
+    def __init__(self, client, video_id: str, title: str, link: str, chunk_size: int = 2000,
+                 max_workers: int = 4):
+        self.client = client
+        self.video = {'video_id': video_id, 'title': title, 'link': link}
+        self.load_id = str(uuid.uuid4())
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self._buffer = []
+        self._chunks = 0
+        self._pending = []
+        self._repeats = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _upload(self, chunk: int, rows: list):
+        with stage('db.stage', len(rows)):
+            self.client.rpc('stage_video_rows', {
+                'p_load_id': self.load_id, 'p_chunk': chunk, 'p_rows': rows
+            }).execute()
+
+    def _stage(self, rows: list):
+        self._pending.append(submit(self._pool, self._upload, self._chunks, rows))
+        self._chunks += 1
+
+    def add(self, rows: list):
+        self._buffer.extend(rows)
+        self.rows += len(rows)
+        while len(self._buffer) >= self.chunk_size:
+            self._stage(self._buffer[:self.chunk_size])
+            self._buffer = self._buffer[self.chunk_size:]
+
+    def add_repeats(self, rows: list):
+        for row in rows:
+            acc = self._repeats.setdefault(row['yt_comment_id'], [0, 0, {}])
+            acc[0] += row['multiplicity']
+            acc[1] += row['likes']
+            acc[2].update(row.get('aliases') or {})
+
+    def _flush(self) -> list:
+        # stage what is buffered, wait for every upload and return the collected repeats
+        if self._buffer:
+            self._stage(self._buffer)
+            self._buffer = []
+        with stage('db.stage_wait'):
+            try:
+                for f in self._pending:
+                    f.result()
+            finally:
+                self._pool.shutdown()
+        return [{'yt_comment_id': yid, 'multiplicity': m, 'likes': lk, 'aliases': al}
+                for yid, (m, lk, al) in self._repeats.items()]
+
+    def commit(self, summary: dict = None) -> int:
+        repeats = self._flush()
+        with stage('db.commit', self.rows):
+            return self.client.rpc('commit_video_load', {
+                'p_video': self.video, 'p_load_id': self.load_id, 'p_summary': summary,
+                'p_repeats': repeats or None
+            }).execute().data
+
+    def commit_update(self, tokens: dict = None) -> int:
+        """Upsert the staged rows, add the repeats, refresh the summary and merge ``tokens`` in one transaction."""
+        repeats = self._flush()
+        with stage('db.commit', self.rows):
+            return self.client.rpc('commit_video_update', {
+                'p_video': self.video, 'p_load_id': self.load_id, 'p_repeats': repeats or None,
+                'p_tokens': tokens
+            }).execute().data
+
+    def abort(self):
+        self._pool.shutdown(cancel_futures=True)
+        self.client.rpc('abort_video_load', {'p_load_id': self.load_id}).execute()
 
 class DBHandler:
     def __init__(self):
@@ -7,7 +132,8 @@ class DBHandler:
         key = os.getenv('SUPABASE_KEY')
         if not url or not key:
             raise RuntimeError('Please set SUPABASE_URL and SUPABASE_KEY in .env')
-        self.client: Client = create_client(url, key)
+        from supabase import create_client
+        self.client = create_client(url, key)
 
     def insert_video(self, video_id: str, title: str, link: str):
         # upsert video record (insert or update) to avoid duplicates
@@ -34,52 +160,66 @@ class DBHandler:
             'sentiment_score': sentiment_score
         }).execute()
 
-    def insert_comments_batch(self, video_id: str, comments: list, likes: list, batch_size: int = 500) -> list:
+    def insert_comments_batch(self, video_id: str, comments: list, likes: list, batch_size: int = 500,
+                              yt_ids: list = None, published: list = None, updated: list = None) -> list:
         """Insert multiple comments in chunks to avoid rate limits, return list of new comment IDs."""
+        none = [None] * len(comments)
+        yt_ids, published, updated = yt_ids or none, published or none, updated or none
         ids = []
         for i in range(0, len(comments), batch_size):
-            chunk_comments = comments[i:i+batch_size]
-            chunk_likes = likes[i:i+batch_size]
+            chunk = zip(comments[i:i+batch_size], likes[i:i+batch_size], yt_ids[i:i+batch_size],
+                        published[i:i+batch_size], updated[i:i+batch_size])
             payload = [
-                {'video_id': video_id, 'comment_text': txt, 'likes': lk}
-                for txt, lk in zip(chunk_comments, chunk_likes)
+                {'video_id': video_id, 'comment_text': txt, 'likes': lk,
+                 'yt_comment_id': yid, 'published_at': pub, 'updated_at': upd}
+                for txt, lk, yid, pub, upd in chunk
             ]
             res = self.client.table('comments').insert(payload).execute()
             ids.extend([row['id'] for row in res.data])
         return ids
 
-    def insert_sentiments_batch(self, comment_ids: list, labels: list, scores: list, batch_size: int = 500):
+    def insert_sentiments_batch(self, comment_ids: list, labels: list, scores: list, batch_size: int = 500,
+                                subjectivities: list = None):
         """Insert multiple sentiment records in chunks to avoid rate limits."""
+        if subjectivities is None:
+            subjectivities = [None] * len(comment_ids)
         for i in range(0, len(comment_ids), batch_size):
             chunk_ids = comment_ids[i:i+batch_size]
             chunk_labels = labels[i:i+batch_size]
             chunk_scores = scores[i:i+batch_size]
+            chunk_subjects = subjectivities[i:i+batch_size]
             payload = [
-                {'comment_id': cid, 'sentiment_label': lbl, 'sentiment_score': sc}
-                for cid, lbl, sc in zip(chunk_ids, chunk_labels, chunk_scores)
+                {'comment_id': cid, 'sentiment_label': lbl, 'sentiment_score': sc, 'subjectivity': subj}
+                for cid, lbl, sc, subj in zip(chunk_ids, chunk_labels, chunk_scores, chunk_subjects)
             ]
             self.client.table('sentiments').insert(payload).execute()
 
-    def insert_comments_with_sentiments_batch(
-        self,
-        video_id: str,
-        comments: list,
-        likes: list,
-        labels: list,
-        scores: list
-    ):
-        """Insert comments along with sentiment data in one bulk call."""
-        payload = [
-            {
-                'video_id': video_id,
-                'comment_text': txt,
-                'likes': lk,
-                'sentiment_label': lbl,
-                'sentiment_score': sc
-            }
-            for txt, lk, lbl, sc in zip(comments, likes, labels, scores)
-        ]
-        self.client.table('comments').insert(payload).execute()
+    def replace_video_analysis(self, video_id: str, title: str, link: str, rows: list,
+                               summary: dict = None, chunk_size: int = 2000) -> int:
+        """
+        Atomically replace a video's record, comments, sentiments and summary with
+        ``rows`` (see ``comment_rows``). Small payloads go in one RPC; larger ones are
+        staged in concurrent chunks and swapped in by a single commit call.
+        """
+        if len(rows) <= chunk_size:
+            return self.client.rpc('replace_video_rows', {
+                'p_video': {'video_id': video_id, 'title': title, 'link': link},
+                'p_rows': rows, 'p_summary': summary
+            }).execute().data
+        load = self.begin_load(video_id, title, link, chunk_size=chunk_size)
+        try:
+            load.add(rows)
+            return load.commit(summary)
+        except Exception:
+            load.abort()
+            raise
+
+    def begin_load(self, video_id: str, title: str, link: str, chunk_size: int = 2000,
+                   max_workers: int = 4) -> 'BulkLoad':
+        """
+        Start a staged replace of a video's analysis that rows can be streamed into.
+        """
+        return BulkLoad(self.client, video_id, title, link, chunk_size, max_workers)
 
     def fetch_videos(self):
         """
@@ -89,6 +229,83 @@ class DBHandler:
             .select('video_id, title, link')\
             .execute().data
 
+    def fetch_analysis_pages(self, video_id: str, page_size: int = 1000):
+        """
+        Yield a video's stored comments joined with their sentiments, one page at a time.
+        Each page is a dict of columns: ids, comments, likes, labels, scores, subjectivities, multiplicities.
+        """
+        after = 0
+        while True:
+            with stage('db.read_page') as timer:
+                page = self.client.rpc('video_analysis_page', {
+                    'p_video_id': video_id, 'p_after': after, 'p_limit': page_size
+                }).execute().data
+                timer.items = len(page['ids']) if page else 0
+            if not page or not page['ids']:
+                return
+            yield page
+            if len(page['ids']) < page_size:
+                return
+            after = page['ids'][-1]
+
+    def fetch_comment_row_pages(self, video_id: str, page_size: int = 1000):
+        """
+        Yield a video's stored rows in the ``comment_rows`` format, one page (a list) at a time.
+        """
+        after = 0
+        while True:
+            with stage('db.read_page') as timer:
+                rows = self.client.rpc('video_comment_rows_page', {
+                    'p_video_id': video_id, 'p_after': after, 'p_limit': page_size
+                }).execute().data or []
+                timer.items = len(rows)
+            if rows:
+                after = rows[-1]['id']
+                yield [{k: v for k, v in r.items() if k != 'id'} for r in rows]
+            if len(rows) < page_size:
+                return
+
+    def upsert_summary(self, video_id: str, summary: dict):
+        """
+        Store the precomputed dashboard row (total, counts, tops, hist, tokens) for a video.
+        """
+        self.client.table('video_summaries').upsert(
+            {'video_id': video_id, **summary}, on_conflict='video_id'
+        ).execute()
+
+    def fetch_summary(self, video_id: str):
+        """
+        Return the precomputed dashboard row for a video, or None if there is none.
+        """
+        res = self.client.table('video_summaries')\
+            .select('total, counts, tops, hist, tokens')\
+            .eq('video_id', video_id)\
+            .execute()
+        return res.data[0] if res.data else None
+
+    def fetch_comment_versions(self, video_id: str, page_size: int = 1000) -> dict:
+        """
+        Map the YouTube comment ID of every stored comment of a video to its updated timestamp.
+
+        The copies collapsed into a stored row (its ``aliases``) are included
+        with their own timestamps, so they are not fetched again as new.
+        """
+        versions, start = {}, 0
+        while True:
+            rows = self.client.table('comments')\
+                .select('yt_comment_id, updated_at, aliases')\
+                .eq('video_id', video_id)\
+                .not_.is_('yt_comment_id', 'null')\
+                .order('id')\
+                .range(start, start + page_size - 1)\
+                .execute().data
+            for row in rows:
+                versions.update((yid, alias['updated_at']) for yid, alias in (row.get('aliases') or {}).items())
+                versions[row['yt_comment_id']] = _yt_timestamp(row['updated_at'])
+            if len(rows) < page_size:
+                return versions
+            start += page_size
+
     def delete_comments_for_video(self, video_id: str):
         """
         Remove all comments and associated sentiment records for a video.
@@ -99,11 +316,11 @@ class DBHandler:
             .eq('video_id', video_id)\
             .execute()
         ids = [row['id'] for row in res.data] if res.data else []
-        if ids:
-            # Delete sentiments for those comments
+        # Delete sentiments for those comments, in chunks that keep the URL short
+        for i in range(0, len(ids), 500):
             self.client.table('sentiments')\
                 .delete()\
-                .in_('comment_id', ids)\
+                .in_('comment_id', ids[i:i+500])\
                 .execute()
         # Delete the comments themselves
         self.client.table('comments')\
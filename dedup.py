@@ -0,0 +1,114 @@
+"""Collapsing of exact and near-duplicate comments before scoring and storage.
+
+Bot floods and copy-paste chains are grouped per analysis: each group is
+scored and stored once, as its first comment with a multiplicity and the
+summed likes of all its copies. Texts are grouped exactly on a normalised
+form that keeps what VADER scores: every word as VADER looks it up (ends
+stripped of punctuation, lowercased unless in capitals), tokens VADER keeps
+whole such as ``ok.`` or ``:)`` as written, and the number of ``!`` and
+``?`` as far as VADER tells them apart. Normalised texts of at least
+``min_chars`` characters also join an earlier group one character edit
+away (a typo, a dropped space), found through an index of their first and
+last ``AFFIX`` characters: a single edit leaves at least one of the two
+intact.
+
+    index = DuplicateIndex()
+    for page in pages:
+        for group in index.collapse(page):
+            ...
+"""
+import string
+from collections import namedtuple
+from instrumentation import stage, count
+
+# comment: the group's first Comment, with likes summed over this page's copies;
+# repeat: the group was returned from an earlier page and this entry adds to it;
+# aliases: comment id -> {'updated_at', 'likes'} of this page's copies other than the first
+Group = namedtuple('Group', ['comment', 'multiplicity', 'repeat', 'aliases'])
+
+AFFIX = 20
+
+def _key_word(token: str) -> str:
+    # as VADER's _strip_punc_if_word: a token of two characters or fewer once stripped is kept whole
+    stripped = token.strip(string.punctuation)
+    if len(stripped) <= 2:
+        return token
+    # the lexicon is looked up lowercased, but words in capitals get VADER's emphasis
+    return stripped if stripped.isupper() else stripped.lower()
+
+def normalize(text: str) -> str:
+    key = ' '.join(map(_key_word, text.split()))
+    # VADER adds emphasis for up to four '!', and for two, three, or more than three '?'
+    excl, ques = min(text.count('!'), 4), text.count('?')
+    marks = '!' * excl + ('?' * min(ques, 4) if ques > 1 else '')
+    return f'{key} {marks}' if marks else key
+
+def one_edit_apart(a: str, b: str) -> bool:
+    """Whether one insertion, deletion or substitution turns ``a`` into ``b``."""
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > 1:
+        return False
+    i = 0
+    while i < len(b) and a[i] == b[i]:
+        i += 1
+    return a[i+1:] == (b[i+1:] if len(a) == len(b) else b[i:])
+
+class DuplicateIndex:
+    """Duplicate groups of one analysis, built page by page.
+
+    At most ``max_candidates`` earlier groups sharing an affix are compared,
+    so common openings such as "who is watching in" stay cheap.
+    """
+
+    def __init__(self, min_chars: int = 40, max_candidates: int = 16):
+        self.min_chars = min_chars
+        self.max_candidates = max_candidates
+        self.comments = 0
+        self._reps = []
+        self._exact = {}
+        self._affixes = {}
+
+    def __len__(self):
+        return len(self._reps)
+
+    def _near(self, key: str):
+        seen = set()
+        for affix in (key[:AFFIX], key[-AFFIX:]):
+            for gid, rep_key in self._affixes.get(affix, ())[-self.max_candidates:]:
+                if gid not in seen and one_edit_apart(key, rep_key):
+                    return gid
+                seen.add(gid)
+        return None
+
+    def collapse(self, page: list) -> list:
+        """Collapse a page of ``Comment`` rows into one ``Group`` per duplicate group on it, in page order."""
+        entries = {}
+        first_new = len(self._reps)
+        with stage('dedup', len(page)):
+            for c in page:
+                key = normalize(c.text)
+                gid = self._exact.get(key)
+                if gid is None:
+                    near = len(key) >= self.min_chars
+                    gid = self._near(key) if near else None
+                    if gid is None:
+                        gid = len(self._reps)
+                        self._reps.append(c)
+                    if near:
+                        # every variant is indexed, so a group also takes typos of its typos;
+                        # prefixes and suffixes share one dict, a chance match is only a candidate
+                        for affix in {key[:AFFIX], key[-AFFIX:]}:
+                            self._affixes.setdefault(affix, []).append((gid, key))
+                    self._exact[key] = gid
+                entry = entries.get(gid)
+                if entry is None:
+                    entry = entries[gid] = [self._reps[gid], 0, 0, gid < first_new, {}]
+                entry[1] += 1
+                entry[2] += c.likes
+                if c is not entry[0] and c.comment_id is not None:
+                    entry[4][c.comment_id] = {'updated_at': c.updated_at, 'likes': c.likes}
+            self.comments += len(page)
+        count('dedup.duplicates', len(page) - (len(self._reps) - first_new))
+        return [Group(rep._replace(likes=likes), n, repeat, aliases)
+                for rep, n, likes, repeat, aliases in entries.values()]
@@ -0,0 +1,177 @@
+"""Per-run stage timings, counters and optional profiling.
+
+Pipeline code marks its work with ``stage('youtube.commentThreads')`` or
+``record``/``count``; the numbers go to the ``RunMetrics`` active in the
+current context and cost next to nothing when no run is active. Work handed
+to a thread pool keeps the caller's run when submitted through ``submit``.
+
+    metrics = RunMetrics('analyze:abc', profile='cprofile')
+    with metrics.activate():
+        ...
+    metrics.write_jsonl('metrics.jsonl')
+"""
+import contextvars, json, os, sys, threading, time
+from collections import Counter
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('run_metrics', default=None)
+
+PROFILERS = ('cprofile', 'sample')
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def current():
+    return _current.get()
+
+def submit(pool, fn, *args):
+    """``pool.submit`` that runs ``fn`` in a copy of the caller's context."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+def record(name: str, seconds: float, items: int = 0, calls: int = 1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_stage(name, seconds, items, calls)
+
+def count(name: str, n: int = 1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, n)
+
+class _Timer:
+    __slots__ = ('items',)
+
+    def __init__(self, items: int):
+        self.items = items
+
+@contextmanager
+def stage(name: str, items: int = 0):
+    """Time the block as one call of stage ``name``; set ``.items`` on the yielded timer if known later."""
+    metrics = _current.get()
+    timer = _Timer(items)
+    if metrics is None:
+        yield timer
+        return
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        metrics.add_stage(name, time.perf_counter() - start, timer.items)
+
+class _Sampler(threading.Thread):
+    # statistical profiler: samples every thread's innermost frame in this project,
+    # so time spent waiting in libraries is charged to the pipeline line that called them
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                while frame is not None and not frame.f_code.co_filename.startswith(_PROJECT_DIR):
+                    frame = frame.f_back
+                if ident != me and frame is not None and frame.f_code.co_filename != __file__:
+                    code = frame.f_code
+                    where = os.path.relpath(code.co_filename, _PROJECT_DIR)
+                    self.samples[f'{code.co_name} ({where}:{frame.f_lineno})'] += 1
+
+    def stop(self, top: int = 25) -> str:
+        self._stop_event.set()
+        self.join()
+        total = sum(self.samples.values()) or 1
+        return '\n'.join(f'{n / total:6.1%}  {where}' for where, n in self.samples.most_common(top))
+
+class RunMetrics:
+    """Stage timings and counters of one analysis run.
+
+    A stage accumulates wall seconds, calls and items; stages timed on
+    worker threads or processes overlap, so their seconds can add up to more
+    than the run's. ``profile`` is None, ``'cprofile'`` (calling thread only)
+    or ``'sample'`` (every thread, sampled every 5 ms and attributed to the
+    innermost line of this project's code).
+    """
+
+    def __init__(self, name: str = '', profile: str = None):
+        if profile not in (None,) + PROFILERS:
+            raise ValueError(f'unknown profiler {profile!r}')
+        self.name = name
+        self.profile = profile
+        self.profile_report = None
+        self.started = time.time()
+        self.seconds = 0.0
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float, items: int = 0, calls: int = 1):
+        with self._lock:
+            st = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'items': 0})
+            st['seconds'] += seconds
+            st['calls'] += calls
+            st['items'] += items
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def activate(self):
+        """Make this the current run for the block, timing and optionally profiling it."""
+        token = _current.set(self)
+        profiler = None
+        if self.profile == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif self.profile == 'sample':
+            profiler = _Sampler()
+            profiler.start()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds += time.perf_counter() - start
+            _current.reset(token)
+            if self.profile == 'cprofile':
+                import io, pstats
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+                self.profile_report = out.getvalue()
+            elif profiler is not None:
+                self.profile_report = profiler.stop()
+
+    def cache_hit_rate(self):
+        hits, misses = self.counters.get('cache.hits', 0), self.counters.get('cache.misses', 0)
+        return hits / (hits + misses) if hits + misses else None
+
+    def rows(self) -> list:
+        """One dict per stage, slowest first, with throughput in items per second."""
+        out = []
+        for name, st in sorted(self.stages.items(), key=lambda kv: -kv[1]['seconds']):
+            out.append({
+                'stage': name, 'seconds': round(st['seconds'], 4), 'calls': st['calls'], 'items': st['items'],
+                'items_per_s': round(st['items'] / st['seconds'], 1) if st['items'] and st['seconds'] else None,
+            })
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            'run': self.name, 'started': self.started, 'seconds': round(self.seconds, 4),
+            'stages': self.rows(), 'counters': dict(self.counters), 'cache_hit_rate': self.cache_hit_rate(),
+        }
+
+    def to_jsonl(self) -> str:
+        """One ``stage`` record per stage plus a closing ``run`` record, for log shippers."""
+        head = {'run': self.name, 'started': self.started}
+        lines = [json.dumps({'type': 'stage', **head, **row}) for row in self.rows()]
+        lines.append(json.dumps({
+            'type': 'run', **head, 'seconds': round(self.seconds, 4),
+            'counters': dict(self.counters), 'cache_hit_rate': self.cache_hit_rate(),
+        }))
+        return '\n'.join(lines) + '\n'
+
+    def write_jsonl(self, path: str):
+        with open(path, 'a') as f:
+            f.write(self.to_jsonl())
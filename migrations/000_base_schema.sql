@@ -0,0 +1,22 @@
+-- Tables used by DBHandler before any migration.
+create table if not exists videos (
+    video_id text primary key,
+    title text,
+    link text
+);
+
+create table if not exists comments (
+    id bigserial primary key,
+    video_id text not null references videos (video_id),
+    comment_text text not null,
+    likes integer not null default 0
+);
+create index if not exists comments_video_id_idx on comments (video_id);
+
+create table if not exists sentiments (
+    id bigserial primary key,
+    comment_id bigint not null references comments (id),
+    sentiment_label text not null,
+    sentiment_score double precision not null
+);
+create index if not exists sentiments_comment_id_idx on sentiments (comment_id);
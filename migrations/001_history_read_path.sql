@@ -0,0 +1,36 @@
+-- History mode reads stored analyses instead of re-fetching from YouTube.
+alter table sentiments add column if not exists subjectivity double precision;
+
+-- one precomputed dashboard row per video
+create table if not exists video_summaries (
+    video_id text primary key references videos (video_id) on delete cascade,
+    total integer not null,
+    counts jsonb not null,
+    tops jsonb not null,
+    hist jsonb not null,
+    updated_at timestamptz not null default now()
+);
+
+-- One page of a video's comments joined with their sentiments, returned as
+-- columns. Keyset-paginated on comments.id: pass the last id seen as p_after.
+create or replace function video_analysis_page(p_video_id text, p_after bigint default 0, p_limit integer default 1000)
+returns json
+language sql stable
+as $$
+    select json_build_object(
+        'ids', coalesce(json_agg(p.id order by p.id), '[]'),
+        'comments', coalesce(json_agg(p.comment_text order by p.id), '[]'),
+        'likes', coalesce(json_agg(p.likes order by p.id), '[]'),
+        'labels', coalesce(json_agg(p.sentiment_label order by p.id), '[]'),
+        'scores', coalesce(json_agg(p.sentiment_score order by p.id), '[]'),
+        'subjectivities', coalesce(json_agg(p.subjectivity order by p.id), '[]')
+    )
+    from (
+        select c.id, c.comment_text, c.likes, s.sentiment_label, s.sentiment_score, s.subjectivity
+        from comments c
+        join sentiments s on s.comment_id = c.id
+        where c.video_id = p_video_id and c.id > p_after
+        order by c.id
+        limit p_limit
+    ) p;
+$$;
@@ -0,0 +1,86 @@
+-- Incremental re-analysis: comments are keyed by their YouTube id so new and
+-- edited comments can be upserted instead of replacing the whole video.
+alter table comments add column if not exists yt_comment_id text;
+alter table comments add column if not exists published_at timestamptz;
+alter table comments add column if not exists updated_at timestamptz;
+create unique index if not exists comments_yt_comment_id_key on comments (yt_comment_id);
+create unique index if not exists sentiments_comment_id_key on sentiments (comment_id);
+
+-- Upsert comments and their sentiments from one JSON array of rows with keys
+-- yt_comment_id, comment_text, likes, published_at, updated_at,
+-- sentiment_label, sentiment_score, subjectivity.
+create or replace function upsert_video_comments(p_video_id text, p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(p_rows) as r(
+            yt_comment_id text, comment_text text, likes integer,
+            published_at timestamptz, updated_at timestamptz,
+            sentiment_label text, sentiment_score double precision, subjectivity double precision
+        )
+    ), upserted as (
+        insert into comments (video_id, yt_comment_id, comment_text, likes, published_at, updated_at)
+        select p_video_id, yt_comment_id, comment_text, likes, published_at, updated_at from incoming
+        on conflict (yt_comment_id) do update
+            set comment_text = excluded.comment_text, likes = excluded.likes, updated_at = excluded.updated_at
+        returning id, yt_comment_id
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select u.id, i.sentiment_label, i.sentiment_score, i.subjectivity
+    from upserted u join incoming i using (yt_comment_id)
+    on conflict (comment_id) do update
+        set sentiment_label = excluded.sentiment_label,
+            sentiment_score = excluded.sentiment_score,
+            subjectivity = excluded.subjectivity;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- Recompute a video's video_summaries row from its stored sentiments, using
+-- the same thresholds, top-comment rules and 20 histogram bins as
+-- SentimentAggregate.
+create or replace function refresh_video_summary(p_video_id text)
+returns void
+language sql
+as $$
+    with scored as (
+        select c.id, c.comment_text, s.sentiment_score as score
+        from comments c join sentiments s on s.comment_id = c.id
+        where c.video_id = p_video_id
+    ), bins as (
+        select least(floor((score + 1) / 2 * 20)::int, 19) as bin, count(*) as n
+        from scored group by 1
+    )
+    insert into video_summaries (video_id, total, counts, tops, hist, updated_at)
+    select
+        p_video_id,
+        (select count(*) from scored),
+        jsonb_build_object(
+            'Positive', (select count(*) from scored where score >= 0.05),
+            'Negative', (select count(*) from scored where score <= -0.05),
+            'Neutral', (select count(*) from scored where score > -0.05 and score < 0.05)
+        ),
+        jsonb_build_object(
+            'Positive', coalesce(
+                (select jsonb_build_object('score', score, 'comment', comment_text) from scored
+                 where score >= 0.05 order by score desc, id limit 1),
+                '{"score": -1, "comment": ""}'::jsonb),
+            'Negative', coalesce(
+                (select jsonb_build_object('score', score, 'comment', comment_text) from scored
+                 where score <= -0.05 order by score, id limit 1),
+                '{"score": 1, "comment": ""}'::jsonb),
+            -- update_tops only replaces the neutral entry when |score| beats its initial 1
+            'Neutral', '{"score": -1, "comment": ""}'::jsonb
+        ),
+        (select jsonb_agg(coalesce(bins.n, 0) order by g.bin)
+         from generate_series(0, 19) as g(bin) left join bins on bins.bin = g.bin),
+        now()
+    on conflict (video_id) do update
+        set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+            hist = excluded.hist, updated_at = excluded.updated_at;
+$$;
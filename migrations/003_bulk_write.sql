@@ -0,0 +1,116 @@
+-- Atomic bulk write path: a video's comments, sentiments and summary are
+-- replaced in one transaction instead of delete-then-insert round trips.
+
+-- One comment with its sentiment, as sent by DBHandler.
+do $$ begin
+    create type comment_row as (
+        yt_comment_id text, comment_text text, likes integer,
+        published_at timestamptz, updated_at timestamptz,
+        sentiment_label text, sentiment_score double precision, subjectivity double precision
+    );
+exception when duplicate_object then null;
+end $$;
+
+-- Rows uploaded in concurrent chunks before commit_video_load swaps them in.
+create table if not exists comment_load_rows (
+    load_id uuid not null,
+    chunk integer not null,
+    ord integer not null,
+    yt_comment_id text,
+    comment_text text not null,
+    likes integer not null default 0,
+    published_at timestamptz,
+    updated_at timestamptz,
+    sentiment_label text not null,
+    sentiment_score double precision not null,
+    subjectivity double precision,
+    primary key (load_id, chunk, ord)
+);
+
+-- Replace everything stored for p_video (keys video_id, title, link) with
+-- the rows of p_rows (same keys as upsert_video_comments), and upsert
+-- p_summary when given.
+create or replace function replace_video_rows(p_video jsonb, p_rows jsonb, p_summary jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    delete from sentiments s using comments c where s.comment_id = c.id and c.video_id = v_id;
+    delete from comments where video_id = v_id;
+
+    with incoming as materialized (
+        select nextval(pg_get_serial_sequence('comments', 'id')) as id, r.*
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        order by r.ordinality
+    ), inserted as (
+        insert into comments (id, video_id, yt_comment_id, comment_text, likes, published_at, updated_at)
+        select id, v_id, yt_comment_id, comment_text, likes, published_at, updated_at from incoming
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select id, sentiment_label, sentiment_score, subjectivity from incoming;
+    get diagnostics n = row_count;
+
+    if p_summary is not null then
+        insert into video_summaries (video_id, total, counts, tops, hist, updated_at)
+        values (v_id, (p_summary->>'total')::int, p_summary->'counts', p_summary->'tops', p_summary->'hist', now())
+        on conflict (video_id) do update
+            set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+                hist = excluded.hist, updated_at = excluded.updated_at;
+    end if;
+    return n;
+end;
+$$;
+
+-- Chunks may arrive in any order; (p_chunk, position in p_rows) keeps the
+-- client's row order for commit_video_load.
+create or replace function stage_video_rows(p_load_id uuid, p_chunk integer, p_rows jsonb)
+returns integer
+language sql
+as $$
+    with ins as (
+        insert into comment_load_rows (
+            load_id, chunk, ord, yt_comment_id, comment_text, likes, published_at, updated_at,
+            sentiment_label, sentiment_score, subjectivity
+        )
+        select p_load_id, p_chunk, r.ordinality, r.yt_comment_id, r.comment_text, r.likes, r.published_at,
+               r.updated_at, r.sentiment_label, r.sentiment_score, r.subjectivity
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        returning 1
+    )
+    select count(*)::int from ins;
+$$;
+
+-- Swap the staged rows of p_load_id in for the video atomically.
+create or replace function commit_video_load(p_video jsonb, p_load_id uuid, p_summary jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    n := replace_video_rows(
+        p_video,
+        coalesce((
+            select jsonb_agg(to_jsonb(r) - 'load_id' - 'chunk' - 'ord' order by r.chunk, r.ord)
+            from comment_load_rows r where r.load_id = p_load_id
+        ), '[]'::jsonb),
+        p_summary
+    );
+    delete from comment_load_rows where load_id = p_load_id;
+    return n;
+end;
+$$;
+
+create or replace function abort_video_load(p_load_id uuid)
+returns void
+language sql
+as $$
+    delete from comment_load_rows where load_id = p_load_id;
+$$;
@@ -0,0 +1,75 @@
+-- Per-label token counts for word clouds, stored with the dashboard summary
+-- as {"Positive": {"word": n, ...}, "Negative": {...}, "Neutral": {...}}.
+alter table video_summaries add column if not exists tokens jsonb;
+
+-- As in 003, and also stores p_summary->'tokens'.
+create or replace function replace_video_rows(p_video jsonb, p_rows jsonb, p_summary jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    delete from sentiments s using comments c where s.comment_id = c.id and c.video_id = v_id;
+    delete from comments where video_id = v_id;
+
+    with incoming as materialized (
+        select nextval(pg_get_serial_sequence('comments', 'id')) as id, r.*
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        order by r.ordinality
+    ), inserted as (
+        insert into comments (id, video_id, yt_comment_id, comment_text, likes, published_at, updated_at)
+        select id, v_id, yt_comment_id, comment_text, likes, published_at, updated_at from incoming
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select id, sentiment_label, sentiment_score, subjectivity from incoming;
+    get diagnostics n = row_count;
+
+    if p_summary is not null then
+        insert into video_summaries (video_id, total, counts, tops, hist, tokens, updated_at)
+        values (v_id, (p_summary->>'total')::int, p_summary->'counts', p_summary->'tops', p_summary->'hist',
+                p_summary->'tokens', now())
+        on conflict (video_id) do update
+            set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+                hist = excluded.hist, tokens = excluded.tokens, updated_at = excluded.updated_at;
+    end if;
+    return n;
+end;
+$$;
+
+-- Add the token counts of newly analyzed comments to a video's index,
+-- keeping the p_limit most frequent tokens per label. A video whose summary
+-- has no index yet is left alone; History rebuilds it from all comments.
+create or replace function merge_video_tokens(p_video_id text, p_tokens jsonb, p_limit integer default 2000)
+returns void
+language sql
+as $$
+    with merged as (
+        select l.label, t.token, sum(t.n) as n
+        from video_summaries v,
+             lateral (select key as label from jsonb_object_keys(v.tokens || p_tokens) as key) l,
+             lateral (
+                 select key as token, value::bigint as n from jsonb_each_text(coalesce(v.tokens->l.label, '{}'))
+                 union all
+                 select key, value::bigint from jsonb_each_text(coalesce(p_tokens->l.label, '{}'))
+             ) t
+        where v.video_id = p_video_id and v.tokens is not null
+        group by l.label, t.token
+    ), ranked as (
+        select label, token, n, row_number() over (partition by label order by n desc, token) as rank
+        from merged
+    )
+    update video_summaries
+    set tokens = coalesce(
+            (select jsonb_object_agg(label, words) from (
+                 select label, jsonb_object_agg(token, n) as words from ranked where rank <= p_limit group by label
+             ) per_label),
+            tokens),
+        updated_at = now()
+    where video_id = p_video_id and tokens is not null;
+$$;
@@ -0,0 +1,224 @@
+-- Duplicate comments are stored once: a row stands for `multiplicity`
+-- copies and its likes are the copies' summed likes. Counts, histograms and
+-- summaries are weighted by multiplicity.
+alter table comments add column if not exists multiplicity integer not null default 1;
+alter table comment_load_rows add column if not exists multiplicity integer not null default 1;
+do $$ begin
+    alter type comment_row add attribute multiplicity integer;
+exception when duplicate_column then null;
+end $$;
+
+-- As in 004, and also stores multiplicity.
+create or replace function replace_video_rows(p_video jsonb, p_rows jsonb, p_summary jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    delete from sentiments s using comments c where s.comment_id = c.id and c.video_id = v_id;
+    delete from comments where video_id = v_id;
+
+    with incoming as materialized (
+        select nextval(pg_get_serial_sequence('comments', 'id')) as id, r.*
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        order by r.ordinality
+    ), inserted as (
+        insert into comments (id, video_id, yt_comment_id, comment_text, likes, published_at, updated_at, multiplicity)
+        select id, v_id, yt_comment_id, comment_text, likes, published_at, updated_at, coalesce(multiplicity, 1)
+        from incoming
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select id, sentiment_label, sentiment_score, subjectivity from incoming;
+    get diagnostics n = row_count;
+
+    if p_summary is not null then
+        insert into video_summaries (video_id, total, counts, tops, hist, tokens, updated_at)
+        values (v_id, (p_summary->>'total')::int, p_summary->'counts', p_summary->'tops', p_summary->'hist',
+                p_summary->'tokens', now())
+        on conflict (video_id) do update
+            set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+                hist = excluded.hist, tokens = excluded.tokens, updated_at = excluded.updated_at;
+    end if;
+    return n;
+end;
+$$;
+
+create or replace function stage_video_rows(p_load_id uuid, p_chunk integer, p_rows jsonb)
+returns integer
+language sql
+as $$
+    with ins as (
+        insert into comment_load_rows (
+            load_id, chunk, ord, yt_comment_id, comment_text, likes, published_at, updated_at,
+            sentiment_label, sentiment_score, subjectivity, multiplicity
+        )
+        select p_load_id, p_chunk, r.ordinality, r.yt_comment_id, r.comment_text, r.likes, r.published_at,
+               r.updated_at, r.sentiment_label, r.sentiment_score, r.subjectivity, coalesce(r.multiplicity, 1)
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        returning 1
+    )
+    select count(*)::int from ins;
+$$;
+
+-- Copies of already staged rows found on later pages, as
+-- [{yt_comment_id, multiplicity, likes}, ...] added to those rows.
+create or replace function add_staged_repeats(p_load_id uuid, p_repeats jsonb)
+returns void
+language sql
+as $$
+    update comment_load_rows l
+    set multiplicity = l.multiplicity + r.multiplicity, likes = l.likes + r.likes
+    from jsonb_to_recordset(p_repeats) as r(yt_comment_id text, multiplicity integer, likes integer)
+    where l.load_id = p_load_id and l.yt_comment_id = r.yt_comment_id;
+$$;
+
+-- As in 003, with p_repeats applied to the staged rows before the swap.
+drop function if exists commit_video_load(jsonb, uuid, jsonb);
+create or replace function commit_video_load(p_video jsonb, p_load_id uuid, p_summary jsonb default null,
+                                             p_repeats jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    if p_repeats is not null then
+        perform add_staged_repeats(p_load_id, p_repeats);
+    end if;
+    n := replace_video_rows(
+        p_video,
+        coalesce((
+            select jsonb_agg(to_jsonb(r) - 'load_id' - 'chunk' - 'ord' order by r.chunk, r.ord)
+            from comment_load_rows r where r.load_id = p_load_id
+        ), '[]'::jsonb),
+        p_summary
+    );
+    delete from comment_load_rows where load_id = p_load_id;
+    return n;
+end;
+$$;
+
+-- As in 002, and also stores multiplicity. An existing row keeps its
+-- multiplicity; copies are added with add_comment_repeats.
+create or replace function upsert_video_comments(p_video_id text, p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(p_rows) as r(
+            yt_comment_id text, comment_text text, likes integer,
+            published_at timestamptz, updated_at timestamptz,
+            sentiment_label text, sentiment_score double precision, subjectivity double precision,
+            multiplicity integer
+        )
+    ), upserted as (
+        insert into comments (video_id, yt_comment_id, comment_text, likes, published_at, updated_at, multiplicity)
+        select p_video_id, yt_comment_id, comment_text, likes, published_at, updated_at, coalesce(multiplicity, 1)
+        from incoming
+        on conflict (yt_comment_id) do update
+            set comment_text = excluded.comment_text, likes = excluded.likes, updated_at = excluded.updated_at
+        returning id, yt_comment_id
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select u.id, i.sentiment_label, i.sentiment_score, i.subjectivity
+    from upserted u join incoming i using (yt_comment_id)
+    on conflict (comment_id) do update
+        set sentiment_label = excluded.sentiment_label,
+            sentiment_score = excluded.sentiment_score,
+            subjectivity = excluded.subjectivity;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- Add copies found on later pages of an incremental run to stored rows.
+create or replace function add_comment_repeats(p_video_id text, p_repeats jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    update comments c
+    set multiplicity = c.multiplicity + r.multiplicity, likes = c.likes + r.likes
+    from jsonb_to_recordset(p_repeats) as r(yt_comment_id text, multiplicity integer, likes integer)
+    where c.video_id = p_video_id and c.yt_comment_id = r.yt_comment_id;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- As in 001, with each row's multiplicity.
+create or replace function video_analysis_page(p_video_id text, p_after bigint default 0, p_limit integer default 1000)
+returns json
+language sql stable
+as $$
+    select json_build_object(
+        'ids', coalesce(json_agg(p.id order by p.id), '[]'),
+        'comments', coalesce(json_agg(p.comment_text order by p.id), '[]'),
+        'likes', coalesce(json_agg(p.likes order by p.id), '[]'),
+        'labels', coalesce(json_agg(p.sentiment_label order by p.id), '[]'),
+        'scores', coalesce(json_agg(p.sentiment_score order by p.id), '[]'),
+        'subjectivities', coalesce(json_agg(p.subjectivity order by p.id), '[]'),
+        'multiplicities', coalesce(json_agg(p.multiplicity order by p.id), '[]')
+    )
+    from (
+        select c.id, c.comment_text, c.likes, c.multiplicity, s.sentiment_label, s.sentiment_score, s.subjectivity
+        from comments c
+        join sentiments s on s.comment_id = c.id
+        where c.video_id = p_video_id and c.id > p_after
+        order by c.id
+        limit p_limit
+    ) p;
+$$;
+
+-- As in 002, with every count weighted by multiplicity.
+create or replace function refresh_video_summary(p_video_id text)
+returns void
+language sql
+as $$
+    with scored as (
+        select c.id, c.comment_text, c.multiplicity as m, s.sentiment_score as score
+        from comments c join sentiments s on s.comment_id = c.id
+        where c.video_id = p_video_id
+    ), bins as (
+        select least(floor((score + 1) / 2 * 20)::int, 19) as bin, sum(m) as n
+        from scored group by 1
+    )
+    insert into video_summaries (video_id, total, counts, tops, hist, updated_at)
+    select
+        p_video_id,
+        (select coalesce(sum(m), 0) from scored),
+        jsonb_build_object(
+            'Positive', (select coalesce(sum(m), 0) from scored where score >= 0.05),
+            'Negative', (select coalesce(sum(m), 0) from scored where score <= -0.05),
+            'Neutral', (select coalesce(sum(m), 0) from scored where score > -0.05 and score < 0.05)
+        ),
+        jsonb_build_object(
+            'Positive', coalesce(
+                (select jsonb_build_object('score', score, 'comment', comment_text) from scored
+                 where score >= 0.05 order by score desc, id limit 1),
+                '{"score": -1, "comment": ""}'::jsonb),
+            'Negative', coalesce(
+                (select jsonb_build_object('score', score, 'comment', comment_text) from scored
+                 where score <= -0.05 order by score, id limit 1),
+                '{"score": 1, "comment": ""}'::jsonb),
+            -- update_tops only replaces the neutral entry when |score| beats its initial 1
+            'Neutral', '{"score": -1, "comment": ""}'::jsonb
+        ),
+        (select jsonb_agg(coalesce(bins.n, 0) order by g.bin)
+         from generate_series(0, 19) as g(bin) left join bins on bins.bin = g.bin),
+        now()
+    on conflict (video_id) do update
+        set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+            hist = excluded.hist, updated_at = excluded.updated_at;
+$$;
@@ -0,0 +1,36 @@
+-- An incremental run is staged like a full load (stage_video_rows) and
+-- applied in one transaction: staged rows are upserted, copies added, and
+-- the summary and word index refreshed together. A run that fails before
+-- the commit leaves the stored analysis untouched, so the next run sees
+-- the same comments as new again instead of skipping them as known.
+create or replace function commit_video_update(p_video jsonb, p_load_id uuid, p_repeats jsonb default null,
+                                               p_tokens jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    n := upsert_video_comments(
+        v_id,
+        coalesce((
+            select jsonb_agg(to_jsonb(r) - 'load_id' - 'chunk' - 'ord' order by r.chunk, r.ord)
+            from comment_load_rows r where r.load_id = p_load_id
+        ), '[]'::jsonb)
+    );
+    if p_repeats is not null then
+        perform add_comment_repeats(v_id, p_repeats);
+    end if;
+    perform refresh_video_summary(v_id);
+    if p_tokens is not null then
+        perform merge_video_tokens(v_id, p_tokens);
+    end if;
+    delete from comment_load_rows where load_id = p_load_id;
+    return n;
+end;
+$$;
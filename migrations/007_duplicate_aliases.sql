@@ -0,0 +1,226 @@
+-- The YouTube ids of the copies collapsed into a stored row, as
+-- {"<yt_comment_id>": {"updated_at": "<updatedAt>", "likes": n}, ...}.
+-- fetch_comment_versions reports them as known, so a time-ordered
+-- incremental run does not store a copy newer than its group's row as a
+-- new comment.
+alter table comments add column if not exists aliases jsonb not null default '{}';
+alter table comment_load_rows add column if not exists aliases jsonb not null default '{}';
+do $$ begin
+    alter type comment_row add attribute aliases jsonb;
+exception when duplicate_column then null;
+end $$;
+
+-- As in 005, and also stores aliases.
+create or replace function replace_video_rows(p_video jsonb, p_rows jsonb, p_summary jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    delete from sentiments s using comments c where s.comment_id = c.id and c.video_id = v_id;
+    delete from comments where video_id = v_id;
+
+    with incoming as materialized (
+        select nextval(pg_get_serial_sequence('comments', 'id')) as id, r.*
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        order by r.ordinality
+    ), inserted as (
+        insert into comments (id, video_id, yt_comment_id, comment_text, likes, published_at, updated_at,
+                              multiplicity, aliases)
+        select id, v_id, yt_comment_id, comment_text, likes, published_at, updated_at, coalesce(multiplicity, 1),
+               coalesce(aliases, '{}')
+        from incoming
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select id, sentiment_label, sentiment_score, subjectivity from incoming;
+    get diagnostics n = row_count;
+
+    if p_summary is not null then
+        insert into video_summaries (video_id, total, counts, tops, hist, tokens, updated_at)
+        values (v_id, (p_summary->>'total')::int, p_summary->'counts', p_summary->'tops', p_summary->'hist',
+                p_summary->'tokens', now())
+        on conflict (video_id) do update
+            set total = excluded.total, counts = excluded.counts, tops = excluded.tops,
+                hist = excluded.hist, tokens = excluded.tokens, updated_at = excluded.updated_at;
+    end if;
+    return n;
+end;
+$$;
+
+create or replace function stage_video_rows(p_load_id uuid, p_chunk integer, p_rows jsonb)
+returns integer
+language sql
+as $$
+    with ins as (
+        insert into comment_load_rows (
+            load_id, chunk, ord, yt_comment_id, comment_text, likes, published_at, updated_at,
+            sentiment_label, sentiment_score, subjectivity, multiplicity, aliases
+        )
+        select p_load_id, p_chunk, r.ordinality, r.yt_comment_id, r.comment_text, r.likes, r.published_at,
+               r.updated_at, r.sentiment_label, r.sentiment_score, r.subjectivity, coalesce(r.multiplicity, 1),
+               coalesce(r.aliases, '{}')
+        from jsonb_populate_recordset(null::comment_row, p_rows) with ordinality as r
+        returning 1
+    )
+    select count(*)::int from ins;
+$$;
+
+-- As in 005, with [{yt_comment_id, multiplicity, likes, aliases}, ...].
+create or replace function add_staged_repeats(p_load_id uuid, p_repeats jsonb)
+returns void
+language sql
+as $$
+    update comment_load_rows l
+    set multiplicity = l.multiplicity + r.multiplicity, likes = l.likes + r.likes,
+        aliases = l.aliases || coalesce(r.aliases, '{}')
+    from jsonb_to_recordset(p_repeats) as r(yt_comment_id text, multiplicity integer, likes integer, aliases jsonb)
+    where l.load_id = p_load_id and l.yt_comment_id = r.yt_comment_id;
+$$;
+
+-- As in 005, and also stores aliases; an edited row keeps its earlier ones.
+create or replace function upsert_video_comments(p_video_id text, p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(p_rows) as r(
+            yt_comment_id text, comment_text text, likes integer,
+            published_at timestamptz, updated_at timestamptz,
+            sentiment_label text, sentiment_score double precision, subjectivity double precision,
+            multiplicity integer, aliases jsonb
+        )
+    ), upserted as (
+        insert into comments (video_id, yt_comment_id, comment_text, likes, published_at, updated_at,
+                              multiplicity, aliases)
+        select p_video_id, yt_comment_id, comment_text, likes, published_at, updated_at, coalesce(multiplicity, 1),
+               coalesce(aliases, '{}')
+        from incoming
+        on conflict (yt_comment_id) do update
+            set comment_text = excluded.comment_text, likes = excluded.likes, updated_at = excluded.updated_at,
+                aliases = comments.aliases || excluded.aliases
+        returning id, yt_comment_id
+    )
+    insert into sentiments (comment_id, sentiment_label, sentiment_score, subjectivity)
+    select u.id, i.sentiment_label, i.sentiment_score, i.subjectivity
+    from upserted u join incoming i using (yt_comment_id)
+    on conflict (comment_id) do update
+        set sentiment_label = excluded.sentiment_label,
+            sentiment_score = excluded.sentiment_score,
+            subjectivity = excluded.subjectivity;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- As in 005, and also records the copies' aliases.
+create or replace function add_comment_repeats(p_video_id text, p_repeats jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    n integer;
+begin
+    update comments c
+    set multiplicity = c.multiplicity + r.multiplicity, likes = c.likes + r.likes,
+        aliases = c.aliases || coalesce(r.aliases, '{}')
+    from jsonb_to_recordset(p_repeats) as r(yt_comment_id text, multiplicity integer, likes integer, aliases jsonb)
+    where c.video_id = p_video_id and c.yt_comment_id = r.yt_comment_id;
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- Take the comments an incremental run stores again (new versions of edited
+-- ones) out of the groups they were collapsed into. A copy leaves its row's
+-- multiplicity, likes and aliases. A row whose own comment is re-stored
+-- hands its remaining copies, old text and score to one of them; without
+-- copies it is deleted. The run's rows are then plain inserts.
+create or replace function detach_video_comments(p_video_id text, p_ids text[])
+returns integer
+language plpgsql
+as $$
+declare
+    r record;
+    v_own integer;
+    v_heir text;
+    n integer;
+begin
+    update comments c
+    set multiplicity = c.multiplicity - d.n, likes = c.likes - d.likes, aliases = c.aliases - d.ids
+    from (
+        select c2.id, count(*)::int as n, sum((c2.aliases->a->>'likes')::int)::int as likes, array_agg(a) as ids
+        from comments c2, jsonb_object_keys(c2.aliases) as a
+        where c2.video_id = p_video_id and a = any(p_ids)
+        group by c2.id
+    ) d
+    where c.id = d.id;
+    get diagnostics n = row_count;
+
+    for r in select id, likes, aliases from comments where video_id = p_video_id and yt_comment_id = any(p_ids) loop
+        if r.aliases = '{}'::jsonb then
+            delete from sentiments where comment_id = r.id;
+            delete from comments where id = r.id;
+        else
+            select coalesce(sum((v->>'likes')::int), 0)::int into v_own from jsonb_each(r.aliases) as e(k, v);
+            v_own := r.likes - v_own;
+            select min(k) into v_heir from jsonb_object_keys(r.aliases) as k;
+            update comments
+            set yt_comment_id = v_heir, updated_at = (r.aliases->v_heir->>'updated_at')::timestamptz,
+                multiplicity = multiplicity - 1, likes = likes - v_own, aliases = aliases - v_heir
+            where id = r.id;
+        end if;
+        n := n + 1;
+    end loop;
+    return n;
+end;
+$$;
+
+-- As in 006, with the run's comments detached from their old groups first.
+create or replace function commit_video_update(p_video jsonb, p_load_id uuid, p_repeats jsonb default null,
+                                               p_tokens jsonb default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_id text := p_video->>'video_id';
+    n integer;
+begin
+    insert into videos (video_id, title, link)
+    values (v_id, p_video->>'title', p_video->>'link')
+    on conflict (video_id) do update set title = excluded.title, link = excluded.link;
+
+    perform detach_video_comments(v_id, array(
+        select yt_comment_id from comment_load_rows where load_id = p_load_id and yt_comment_id is not null
+        union
+        select jsonb_object_keys(aliases) from comment_load_rows where load_id = p_load_id
+        union
+        select jsonb_object_keys(coalesce(r->'aliases', '{}'))
+        from jsonb_array_elements(coalesce(p_repeats, '[]'::jsonb)) as r
+    ));
+    n := upsert_video_comments(
+        v_id,
+        coalesce((
+            select jsonb_agg(to_jsonb(r) - 'load_id' - 'chunk' - 'ord' order by r.chunk, r.ord)
+            from comment_load_rows r where r.load_id = p_load_id
+        ), '[]'::jsonb)
+    );
+    if p_repeats is not null then
+        perform add_comment_repeats(v_id, p_repeats);
+    end if;
+    perform refresh_video_summary(v_id);
+    if p_tokens is not null then
+        perform merge_video_tokens(v_id, p_tokens);
+    end if;
+    delete from comment_load_rows where load_id = p_load_id;
+    return n;
+end;
+$$;
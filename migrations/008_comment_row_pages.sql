@@ -0,0 +1,19 @@
+-- One page of a video's stored rows in the shape of comment_row, with their
+-- ids, for copying an analysis out of the database (ResultStore.export).
+-- Keyset-paginated on comments.id like video_analysis_page.
+create or replace function video_comment_rows_page(p_video_id text, p_after bigint default 0,
+                                                   p_limit integer default 1000)
+returns json
+language sql stable
+as $$
+    select coalesce(json_agg(p order by p.id), '[]')
+    from (
+        select c.id, c.yt_comment_id, c.comment_text, c.likes, c.published_at, c.updated_at,
+               s.sentiment_label, s.sentiment_score, s.subjectivity, c.multiplicity
+        from comments c
+        join sentiments s on s.comment_id = c.id
+        where c.video_id = p_video_id and c.id > p_after
+        order by c.id
+        limit p_limit
+    ) p;
+$$;
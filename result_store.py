@@ -0,0 +1,244 @@
+"""Columnar files of analysis results, one Parquet file per video.
+
+A file holds the video's stored comment rows (the columns of ``comment_rows``
+plus ``video_id``) with dictionary-encoded labels and video ids, and keeps
+the video record and dashboard summary in its metadata. History can then
+be served, and many videos re-aggregated, without the database::
+
+    store = ResultStore('results')
+    table = store.read(columns=['video_id', 'sentiment_label', 'likes'])
+
+Files are read memory-mapped and only the requested columns are decoded.
+A file is written in row groups while the analysis runs and only then put
+in place. Needs pyarrow, which is imported on first use.
+"""
+import importlib.util, json, os, tempfile
+from instrumentation import stage
+
+COLUMNS = ('yt_comment_id', 'comment_text', 'likes', 'published_at', 'updated_at',
+           'sentiment_label', 'sentiment_score', 'subjectivity', 'multiplicity')
+
+def _schema():
+    import pyarrow as pa
+    label = pa.dictionary(pa.int32(), pa.string())
+    ts = pa.timestamp('s', tz='UTC')
+    return pa.schema([
+        ('video_id', label), ('yt_comment_id', pa.string()), ('comment_text', pa.string()),
+        ('likes', pa.int64()), ('published_at', ts), ('updated_at', ts), ('sentiment_label', label),
+        ('sentiment_score', pa.float64()), ('subjectivity', pa.float64()), ('multiplicity', pa.int32()),
+    ])
+
+def _table(video_id: str, cols: dict):
+    # cols: COLUMNS as lists, timestamps as ISO strings or datetimes
+    import pyarrow as pa
+    schema = _schema()
+    n = len(cols['yt_comment_id'])
+    arrays = []
+    for field in schema:
+        values = [video_id] * n if field.name == 'video_id' else cols[field.name]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        elif pa.types.is_timestamp(field.type) and any(isinstance(v, str) for v in values):
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def _rewrite_with_repeats(src: str, dst: str, repeats: dict, meta: dict):
+    # second pass over a finished file, a batch at a time: add the repeats and the final metadata
+    import pyarrow as pa, pyarrow.compute as pc, pyarrow.parquet as pq
+    ids = pa.array(list(repeats), pa.string())
+    extra = {'multiplicity': pa.array([m for m, _ in repeats.values()], pa.int32()),
+             'likes': pa.array([lk for _, lk in repeats.values()], pa.int64())}
+    schema = _schema().with_metadata(meta)
+    with pq.ParquetWriter(dst, schema, compression='zstd') as out:
+        for batch in pq.ParquetFile(src, memory_map=True).iter_batches():
+            table = pa.Table.from_batches([batch])
+            idx = pc.index_in(table['yt_comment_id'], value_set=ids)
+            for name, values in extra.items():
+                added = pc.fill_null(pc.take(values, idx), 0)
+                table = table.set_column(schema.get_field_index(name), name, pc.add(table[name], added))
+            out.write_table(table.cast(schema))
+
+class ResultWriter:
+    """One video's rows, streamed to a temporary file and put in place on ``commit``, like ``BulkLoad``.
+
+    Rows are written in row groups of ``row_group_size``; only the rows of
+    the current group and a count and likes per repeated row stay in memory.
+    Repeats are applied by a second pass over the finished file. If
+    ``commit`` fails, the video's old file is removed too: the database is
+    committed first, and History would otherwise show a file that no longer
+    matches it.
+    """
+
+    def __init__(self, store, video_id: str, title: str, link: str, row_group_size: int = 10000):
+        self.store = store
+        self.video = {'video_id': video_id, 'title': title, 'link': link}
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._buffer = []
+        self._repeats = {}
+        self._writer = None
+        self._tmp = None
+
+    def _write_group(self, rows: list):
+        import pyarrow.parquet as pq
+        if self._writer is None:
+            fd, self._tmp = tempfile.mkstemp(prefix=self.video['video_id'] + '.', suffix='.part', dir=self.store.root)
+            os.close(fd)
+            self._writer = pq.ParquetWriter(self._tmp, _schema(), compression='zstd')
+        with stage('store.write', len(rows)):
+            self._writer.write_table(_table(self.video['video_id'], {k: [r[k] for r in rows] for k in COLUMNS}))
+
+    def add(self, rows: list):
+        self._buffer.extend(rows)
+        self.rows += len(rows)
+        while len(self._buffer) >= self.row_group_size:
+            self._write_group(self._buffer[:self.row_group_size])
+            self._buffer = self._buffer[self.row_group_size:]
+
+    def add_repeats(self, rows: list):
+        for row in rows:
+            acc = self._repeats.setdefault(row['yt_comment_id'], [0, 0])
+            acc[0] += row['multiplicity']
+            acc[1] += row['likes']
+
+    def _finish(self, meta: dict = None) -> str:
+        # write what is buffered, close the temporary file and return its path
+        if self._buffer or self._writer is None:
+            self._write_group(self._buffer)
+            self._buffer = []
+        if meta and not self._repeats:
+            self._writer.add_key_value_metadata(meta)
+        self._writer.close()
+        self._writer = None
+        return self._tmp
+
+    def commit(self, summary: dict = None) -> str:
+        meta = {'video': json.dumps(self.video)}
+        if summary is not None:
+            meta['summary'] = json.dumps(summary)
+        path = self.store.path(self.video['video_id'])
+        try:
+            tmp = self._finish(meta)
+            if self._repeats:
+                with stage('store.repeats', self.rows):
+                    _rewrite_with_repeats(tmp, tmp + '.tmp', self._repeats, meta)
+                os.replace(tmp + '.tmp', tmp)
+            os.replace(tmp, path)
+        except Exception:
+            self.abort()
+            self.store.remove(self.video['video_id'])
+            raise
+        return path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        for tmp in (self._tmp, self._tmp and self._tmp + '.tmp'):
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+        self._buffer, self._repeats, self._writer, self._tmp = [], {}, None, None
+
+class ResultStore:
+    """Directory of per-video result files.
+
+    Offers the read methods of ``DBHandler`` that History uses
+    (``fetch_videos``, ``fetch_summary``, ``fetch_analysis_pages``,
+    ``upsert_summary``), so either can serve a stored analysis.
+    """
+
+    def __init__(self, root: str):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError('ResultStore needs pyarrow: pip install pyarrow')
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, video_id: str) -> str:
+        return os.path.join(self.root, f'{video_id}.parquet')
+
+    def has(self, video_id: str) -> bool:
+        return os.path.exists(self.path(video_id))
+
+    def remove(self, video_id: str):
+        if self.has(video_id):
+            os.remove(self.path(video_id))
+
+    def _metadata(self, video_id: str) -> dict:
+        import pyarrow.parquet as pq
+        return pq.read_metadata(self.path(video_id)).metadata or {}
+
+    def _write(self, video: dict, table, summary: dict = None) -> str:
+        import pyarrow.parquet as pq
+        meta = {b'video': json.dumps(video)}
+        if summary is not None:
+            meta[b'summary'] = json.dumps(summary)
+        path = self.path(video['video_id'])
+        tmp = path + '.tmp'
+        with stage('store.write', table.num_rows):
+            pq.write_table(table.replace_schema_metadata(meta), tmp, compression='zstd')
+            os.replace(tmp, path)
+        return path
+
+    def _read_table(self, video_id: str):
+        import pyarrow.parquet as pq
+        # the pandas schema is dropped so a rewrite starts from plain Arrow metadata
+        return pq.read_table(self.path(video_id), memory_map=True).replace_schema_metadata()
+
+    def begin(self, video_id: str, title: str, link: str) -> ResultWriter:
+        """Start collecting a video's rows, written with ``commit``."""
+        return ResultWriter(self, video_id, title, link)
+
+    def export(self, db, video_id: str, title: str, link: str) -> str:
+        """Write a video's file from its stored rows and summary in ``db`` (a ``DBHandler``).
+
+        Used after incremental runs, which change stored rows in place, and
+        for videos analysed before the store was configured. If the copy
+        fails the video has no file, rather than a stale one.
+        """
+        export = self.begin(video_id, title, link)
+        try:
+            for rows in db.fetch_comment_row_pages(video_id):
+                export.add(rows)
+            return export.commit(db.fetch_summary(video_id))
+        except Exception:
+            export.abort()
+            self.remove(video_id)
+            raise
+
+    def fetch_videos(self) -> list:
+        """The video record of every file, read from the file footers only."""
+        names = sorted(n for n in os.listdir(self.root) if n.endswith('.parquet'))
+        return [json.loads(self._metadata(n[:-len('.parquet')])[b'video']) for n in names]
+
+    def fetch_summary(self, video_id: str):
+        summary = self._metadata(video_id).get(b'summary')
+        return json.loads(summary) if summary else None
+
+    def upsert_summary(self, video_id: str, summary: dict):
+        video = json.loads(self._metadata(video_id)[b'video'])
+        self._write(video, self._read_table(video_id), summary)
+
+    def fetch_analysis_pages(self, video_id: str, page_size: int = 1000):
+        """Yield the file's rows in the page format of ``DBHandler.fetch_analysis_pages``; ids are row numbers."""
+        import pyarrow.parquet as pq
+        names = {'comment_text': 'comments', 'likes': 'likes', 'sentiment_label': 'labels',
+                 'sentiment_score': 'scores', 'subjectivity': 'subjectivities', 'multiplicity': 'multiplicities'}
+        after = 0
+        for batch in pq.ParquetFile(self.path(video_id), memory_map=True).iter_batches(page_size, columns=list(names)):
+            with stage('store.read_page', batch.num_rows):
+                page = {names[k]: batch.column(k).to_pylist() for k in names}
+            page['ids'] = list(range(after + 1, after + batch.num_rows + 1))
+            after += batch.num_rows
+            yield page
+
+    def read(self, video_ids: list = None, columns: list = None):
+        """One Arrow table of the given videos' files (default: all), decoding only ``columns``."""
+        import pyarrow.parquet as pq
+        ids = video_ids if video_ids is not None else [v['video_id'] for v in self.fetch_videos()]
+        if not ids:
+            return _schema().empty_table().select(columns or _schema().names)
+        with stage('store.read', len(ids)):
+            table = pq.ParquetDataset([self.path(v) for v in ids], memory_map=True).read(columns=columns)
+            # every file has its own label and video id dictionaries; share them so grouping works
+            return table.unify_dictionaries()
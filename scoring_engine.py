@@ -0,0 +1,106 @@
+import os, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import stage, record
+
+# "vader" calls vaderSentiment per comment; "vectorized" is the NumPy batch
+# scorer from vader_vectorized, which returns identical compound scores
+BACKENDS = ('vader', 'vectorized')
+
+# per-process analyzers, built once by _init_worker (or lazily when scoring serially)
+_compound = {}
+_subjectivity = None
+
+def _init_worker(backend: str = 'vader'):
+    global _subjectivity
+    # subjectivity first: threads scoring serially only check _compound
+    if _subjectivity is None:
+        from textblob.en.sentiments import PatternAnalyzer
+        _subjectivity = PatternAnalyzer()
+    if backend not in _compound:
+        if backend == 'vectorized':
+            from vader_vectorized import VectorizedVader
+            _compound[backend] = VectorizedVader().compound
+        else:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            polarity = SentimentIntensityAnalyzer().polarity_scores
+            _compound[backend] = lambda texts: [polarity(t)['compound'] for t in texts]
+
+def _score_chunk(args) -> tuple:
+    # returns (scores, subjects, vader seconds, subjectivity seconds)
+    texts, with_subjectivity, backend = args
+    if backend not in _compound:
+        _init_worker(backend)
+    start = time.perf_counter()
+    scores = _compound[backend](texts)
+    vader_seconds = time.perf_counter() - start
+    subjects = None
+    subj_seconds = 0.0
+    if with_subjectivity:
+        start = time.perf_counter()
+        analyze = _subjectivity.analyze
+        subjects = [analyze(t).subjectivity for t in texts]
+        subj_seconds = time.perf_counter() - start
+    return scores, subjects, vader_seconds, subj_seconds
+
+class ScoringEngine:
+    """Computes VADER compound and TextBlob subjectivity for lists of comments.
+
+    Inputs of at least ``serial_threshold`` texts are split into chunks of
+    ``chunk_size`` and scored on a process pool of ``workers`` processes;
+    smaller inputs (or ``workers=1``) are scored in-process. The threshold
+    sits well below one API page (up to 100 comments), so pages scored by
+    concurrent fetch threads run in parallel processes, not under the GIL.
+    Output order always matches input order. ``backend`` picks the VADER
+    implementation (see ``BACKENDS``); both give the same scores. VADER and
+    TextBlob time is reported to the active run as the ``score.vader`` and
+    ``score.subjectivity`` stages, summed over workers.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = 500, serial_threshold: int = 20,
+                 backend: str = 'vader'):
+        if backend not in BACKENDS:
+            raise ValueError(f'unknown scoring backend {backend!r}, expected one of {BACKENDS}')
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.serial_threshold = serial_threshold
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # score() runs on concurrent fetch threads; only one of them may create the pool
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                     initargs=(self.backend,))
+        return self._pool
+
+    def score(self, texts: list, subjectivity: bool = False) -> tuple:
+        """Return ``(scores, subjectivities)``; subjectivities is None unless requested."""
+        with stage('score', len(texts)):
+            if self.workers <= 1 or len(texts) < self.serial_threshold:
+                scores, subjects, vader_seconds, subj_seconds = _score_chunk((texts, subjectivity, self.backend))
+            else:
+                chunks = [
+                    (texts[i:i+self.chunk_size], subjectivity, self.backend)
+                    for i in range(0, len(texts), self.chunk_size)
+                ]
+                scores, subjects = [], [] if subjectivity else None
+                vader_seconds = subj_seconds = 0.0
+                for chunk_scores, chunk_subjects, vs, ss in self._get_pool().map(_score_chunk, chunks):
+                    scores.extend(chunk_scores)
+                    vader_seconds += vs
+                    subj_seconds += ss
+                    if subjectivity:
+                        subjects.extend(chunk_subjects)
+        record('score.vader', vader_seconds, len(texts))
+        if subjectivity:
+            record('score.subjectivity', subj_seconds, len(texts))
+        return scores, subjects
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -1,31 +1,111 @@
-import re, time
+import time
 import streamlit as st
-import pandas as pd
-import altair as alt
-from textblob import TextBlob
-from wordcloud import WordCloud, STOPWORDS
-from youtube_client import YouTubeClient
+from youtube_client import YouTubeClient, sanitize_text
 from comment_filter import CommentFilter
-from sentiment_service import SentimentService
-from db_handler import DBHandler
+from sentiment_service import LABELS, SentimentService, SentimentAggregate, SentimentBatch
+from sentiment_cache import SentimentCache
+from scoring_engine import ScoringEngine
+from db_handler import DBHandler, group_rows
+from dedup import DuplicateIndex
+from instrumentation import RunMetrics, stage
 import os
 from dotenv import load_dotenv
+# pandas, altair, textblob and wordcloud are imported where first used to keep cold start fast
 
 load_dotenv()
 
 # Replace with API key from .env
 API_KEY = os.getenv('YT_API_KEY')
+# optional JSON lines file every run's metrics are appended to
+METRICS_PATH = os.getenv('METRICS_PATH')
+# optional directory every analysis is also written to as a Parquet file; History reads a video from its file when it has one
+RESULTS_DIR = os.getenv('RESULTS_DIR')
+PROFILERS = {'Off': None, 'cProfile': 'cprofile', 'Sampling': 'sample'}
 
-# helper to remove HTML line breaks
-def sanitize_text(text):
-    return re.sub(r'<br\s*/?>', ' ', text, flags=re.IGNORECASE)
+# Clients are built once per process and shared by every session and rerun.
+@st.cache_resource
+def get_youtube_client() -> YouTubeClient:
+    return YouTubeClient(API_KEY)
+
+@st.cache_resource
+def get_comment_filter() -> CommentFilter:
+    return CommentFilter()
+
+@st.cache_resource
+def get_sentiment_service() -> SentimentService:
+    # optional on-disk score cache so repeated analyses survive restarts
+    return SentimentService(
+        engine=ScoringEngine(backend=os.getenv('SENTIMENT_BACKEND', 'vader')),
+        cache=SentimentCache(path=os.getenv('SENTIMENT_CACHE_PATH'))
+    )
+
+@st.cache_resource
+def get_db() -> DBHandler:
+    return DBHandler()
+
+@st.cache_resource
+def get_result_store():
+    if not RESULTS_DIR:
+        return None
+    from result_store import ResultStore
+    return ResultStore(RESULTS_DIR)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def word_cloud_image(video_id: str, label: str, fingerprint: tuple, _agg: SentimentAggregate):
+    # one image per video, label and analysis state; _agg is not hashed
+    from wordcloud import WordCloud, STOPWORDS
+    freqs = _agg.word_frequencies(label, STOPWORDS)
+    if not freqs:
+        return None
+    with stage('render.wordcloud', len(freqs)):
+        return WordCloud(
+            width=800, height=400,
+            background_color='black',
+            max_words=200,
+            colormap='plasma',
+            contour_width=1,
+            contour_color='white'
+        ).generate_from_frequencies(freqs).to_array()
 
 class StreamlitApp:
-    def __init__(self):
-        self.yt = YouTubeClient(API_KEY)
-        self.filter = CommentFilter()
-        self.sent = SentimentService()
-        self.db  = DBHandler()
+    # resources are resolved on first use, so a plain page render builds none of them
+    @property
+    def yt(self) -> YouTubeClient:
+        return get_youtube_client()
+
+    @property
+    def filter(self) -> CommentFilter:
+        return get_comment_filter()
+
+    @property
+    def sent(self) -> SentimentService:
+        return get_sentiment_service()
+
+    @property
+    def db(self) -> DBHandler:
+        return get_db()
+
+    @property
+    def store(self):
+        return get_result_store()
+
+    def _remember(self, mode: str, vid: str, title: str, agg: SentimentAggregate):
+        # memoize per video so reruns (widget changes, mode switches) re-render without recomputing
+        st.session_state.setdefault('analyses', {})[vid] = {'title': title, 'agg': agg}
+        st.session_state[f'shown_{mode}'] = vid
+        st.session_state.pop(f'metrics_{mode}', None)
+
+    def _show_remembered(self, mode: str) -> bool:
+        vid = st.session_state.get(f'shown_{mode}')
+        result = st.session_state.get('analyses', {}).get(vid)
+        if not result:
+            return False
+        self._show_video(vid)
+        st.subheader(result['title'])
+        self._render_tabs(vid, result['agg'])
+        if f'metrics_{mode}' in st.session_state:
+            self._show_metrics(st.session_state[f'metrics_{mode}'])
+        return True
 
     def run(self):
         # Configure page layout
@@ -39,9 +119,15 @@ class StreamlitApp:
         mode = st.sidebar.radio('Mode', ['Analyze', 'History'])
         
         analysis_url = None
+        history_video = None
         persist = True  # whether to save analysis back to DB
+        incremental = False
         if mode == 'Analyze':
             url = st.sidebar.text_input('Enter YouTube video URL:')
+            incremental = st.sidebar.checkbox(
+                'Only analyze new comments', value=True,
+                help='For videos analyzed before, fetch and score only comments added or edited since the last run.'
+            )
             if st.sidebar.button('Run Analysis'):
                 if url:
                     analysis_url = url
@@ -50,16 +136,18 @@ class StreamlitApp:
                     st.sidebar.warning('Please enter a YouTube URL.')
         else:
             # History
-            videos = self.db.fetch_videos()
+            videos = self._history_videos()
             if not videos:
                 st.sidebar.warning('No analysis history found.')
             else:
                 titles = [f"{v['title']} ({v['video_id']})" for v in videos]
                 selected = st.sidebar.selectbox('Select past video:', titles)
                 if st.sidebar.button('Load Analysis'):
-                    idx = titles.index(selected)
-                    analysis_url = videos[idx]['link']
-                    persist = False
+                    history_video = videos[titles.index(selected)]
+        profiler = st.sidebar.selectbox(
+            'Profiler', list(PROFILERS),
+            help='Profile the next run; the report appears in the Performance panel.'
+        )
         # Main title
         st.title('YouTube Comment Sentiment Analysis')
         # mobile prompt to open sidebar
@@ -78,113 +166,284 @@ class StreamlitApp:
             "- Supabase storage with history view"
         )
         # Run analysis if a URL is set
-        if analysis_url:
-            self._run_analysis(analysis_url, persist)
+        if analysis_url or history_video:
+            name = f'analyze:{analysis_url}' if analysis_url else f"history:{history_video['video_id']}"
+            metrics = RunMetrics(name, profile=PROFILERS[profiler])
+            with metrics.activate():
+                if analysis_url:
+                    self._run_analysis(analysis_url, persist, incremental)
+                else:
+                    self._load_history(history_video)
+            st.session_state[f'metrics_{mode}'] = metrics
+            if METRICS_PATH:
+                metrics.write_jsonl(METRICS_PATH)
+            self._show_metrics(metrics)
+        else:
+            self._show_remembered(mode)
 
-    def _run_analysis(self, url: str, persist: bool = True):
-        vid = self.yt.extract_video_id(url)
+    def _show_video(self, vid: str):
         c1, c2, c3 = st.columns([1, 2, 1])
         with c2:
             iframe = f"<iframe width='400' height='200' src='https://www.youtube.com/embed/{vid}' frameborder='0' allowfullscreen></iframe>"
             st.markdown(iframe, unsafe_allow_html=True)
+
+    def _history_videos(self) -> list:
+        # result files first, then videos only in the database; without database settings the files alone
+        videos = self.store.fetch_videos() if self.store else []
+        if self.store and not (os.getenv('SUPABASE_URL') and os.getenv('SUPABASE_KEY')):
+            return videos
+        exported = {v['video_id'] for v in videos}
+        return videos + [v for v in self.db.fetch_videos() if v['video_id'] not in exported]
+
+    def _load_history(self, video: dict):
+        # render a stored analysis from its result file or the database, without calling YouTube
+        vid = video['video_id']
+        self._show_video(vid)
+        st.subheader(f"History: {video['title']}")
+        source = self.store if self.store and self.store.has(vid) else self.db
+        try:
+            self._render_stored(vid, video['title'], 'History', source)
+        except Exception as e:
+            st.error(f'Error: {e}')
+
+    def _render_stored(self, vid: str, title: str, mode: str, source=None):
+        # source: the DBHandler, or a ResultStore holding the video's file
+        source = source or self.db
+        summary = source.fetch_summary(vid)
+        agg = SentimentAggregate.from_summary(summary) if summary else SentimentAggregate()
+        # summaries stored before the word index existed get it rebuilt from the comments
+        backfill = summary is not None and summary.get('tokens') is None
+        live = st.empty()
+        if summary:
+            with stage('render.live'), live.container():
+                self._render_live(agg)
+        for page in source.fetch_analysis_pages(vid):
+            subjects = page['subjectivities']
+            missing = [i for i, sj in enumerate(subjects) if sj is None]
+            if missing:
+                # analyses stored before subjectivity was persisted
+                _, filled = self.sent.engine.score([page['comments'][i] for i in missing], subjectivity=True)
+                for i, sj in zip(missing, filled):
+                    subjects[i] = sj
+            batch = SentimentBatch(page['comments'], page['scores'], page['likes'], subjects, page['multiplicities'])
+            if summary:
+                agg.add_sample(batch)
+                if backfill:
+                    agg.add_tokens(batch)
+            else:
+                agg.update(batch)
+        live.empty()
+        if not agg.total:
+            st.warning('No stored comments found for this video.')
+            return
+        if not summary or backfill:
+            source.upsert_summary(vid, agg.to_summary())
+        self._remember(mode, vid, title, agg)
+        with stage('render.tabs'):
+            self._render_tabs(vid, agg)
+
+    def _run_incremental(self, vid: str, title: str, url: str, known: dict):
+        # newest first, stopping at the first page that reaches already stored comments
+        status = st.empty()
+        changed = 0
+        # word counts of the new comments, added to the stored index afterwards
+        new_words = SentimentAggregate(max_rows=0)
+        # copies are only collapsed among this run's comments
+        dedup = DuplicateIndex()
+        # rows are staged and applied with the summary refresh in one transaction, so a
+        # failed run leaves nothing half-applied for the next run to skip as known
+        load = self.db.begin_load(vid, title, url)
+        try:
+            for page in self.yt.get_comment_pages(vid, self.filter, order='time', known=known):
+                groups = dedup.collapse(page)
+                batch = self.sent.analyze_groups(groups, [sanitize_text(g.comment.text) for g in groups], subjectivity=True)
+                new_words.add_tokens(batch)
+                rows, repeats = group_rows(groups, batch)
+                load.add(rows)
+                load.add_repeats(repeats)
+                changed += len(page)
+                status.info(f'{changed} new or edited comments analyzed...')
+            load.commit_update(new_words.token_summary())
+        except Exception:
+            load.abort()
+            raise
+        if self.store and (changed or not self.store.has(vid)):
+            # edits move comments between stored rows, so the file is copied from the database
+            # afresh; this also creates it for a video analysed before RESULTS_DIR was set
+            self.store.export(self.db, vid, title, url)
+        status.success(f'Incremental update done: {changed} new or edited comments analyzed.')
+        self._render_stored(vid, title, 'Analyze')
+
+    def _run_analysis(self, url: str, persist: bool = True, incremental: bool = False):
+        vid = self.yt.extract_video_id(url)
+        self._show_video(vid)
         try:
             title = self.yt.get_video_title(vid)
             st.subheader(f'Analyzing: {title}')
-            with st.spinner('Fetching and analyzing...'):
-                comments = self.yt.get_comments(vid, self.filter)
-                raw_comments = [ (sanitize_text(txt), likes) for (txt, likes) in comments ]
-                comments = [txt for txt, _ in raw_comments]
-                comment_likes = [likes for _, likes in raw_comments]
-                counts   = self.sent.classify_counts(comments)
-                tops     = self.sent.top_comments(comments)
-            st.success('Analysis Done!')
-
-            # Dedicated tabs for table and each chart
-            tabs = st.tabs(['Data Table', 'Bar Chart', 'Histogram', 'Pie Chart', 'Scatter Plot', 'Word Cloud'])
-            labels, sizes = list(counts.keys()), list(counts.values())
-            # Data Table tab
-            with tabs[0]:
-                st.subheader('Comments & Sentiment Table')
-                df = pd.DataFrame({
-                    'Comment': comments,
-                    'Likes': comment_likes,
-                    'Sentiment Score': [self.sent.score(c) for c in comments],
-                    'Label': ['Positive' if s>0.5 else 'Negative' if s< -0.5 else 'Neutral' for s in [self.sent.score(c) for c in comments]]
-                }).sort_values('Likes',ascending = False)
-                def color_score(val):
-                    if val > 0.5:
-                        return 'color: green'
-                    elif val < -0.5:
-                        return 'color: red'
-                    else:
-                        return 'color: grey'
-                styled = df.style.applymap(color_score, subset=['Sentiment Score'])
-                st.dataframe(styled)
-                st.markdown(':green[**Top Positive Comment:**]')
-                st.write(f"{sanitize_text(tops['Positive']['comment'])} (score: {tops['Positive']['score']})")
-                st.markdown(':red[**Top Negative Comment:**]')
-                st.write(f"{sanitize_text(tops['Negative']['comment'])} (score: {tops['Negative']['score']})")
-            # Bar Chart tab
-            with tabs[1]:
-                bar_df = pd.DataFrame({'Sentiment': labels, 'Count': sizes})
-                bar = alt.Chart(bar_df).mark_bar().encode(
-                    x='Sentiment', y='Count',
-                    color=alt.Color('Sentiment', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green']))
-                )
-                st.altair_chart(bar, use_container_width=True)
-            # Histogram tab
-            with tabs[2]:
-                hist_df = pd.DataFrame({'Score': [self.sent.score(c) for c in comments]})
-                hist = alt.Chart(hist_df).mark_bar().encode(x=alt.X('Score:Q', bin=True), y='count()')
-                st.altair_chart(hist, use_container_width=True)
-            # Pie Chart tab
-            with tabs[3]:
-                pie_df = pd.DataFrame({'Sentiment': labels, 'Count': sizes})
-                colors = ['red' if l=='Negative' else 'grey' if l=='Neutral' else 'green' for l in pie_df['Sentiment']]
-                st.plotly_chart({'data': [{'labels': pie_df['Sentiment'], 'values': pie_df['Count'], 'type': 'pie', 'marker': {'colors': colors}}]}, use_container_width=True)
-            # Scatter Plot tab
-            with tabs[4]:
-                scores = [self.sent.score(c) for c in comments]
-                subjects = [TextBlob(c).sentiment.subjectivity for c in comments]
-                labels_list = ['Positive' if s>=0.05 else 'Negative' if s<=-0.05 else 'Neutral' for s in scores]
-                sc_df = pd.DataFrame({'Sentiment': scores, 'Subjectivity': subjects, 'Comment': comments, 'Label': labels_list})
-                chart = alt.Chart(sc_df).mark_circle().encode(
-                    x=alt.X('Sentiment', scale=alt.Scale(domain=[-1,1])),
-                    y=alt.Y('Subjectivity', scale=alt.Scale(domain=[0,1])),
-                    color=alt.Color('Label', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green'])),
-                    tooltip=['Label','Sentiment','Subjectivity','Comment']
-                )
-                st.altair_chart(chart, use_container_width=True)
-            # Word Cloud tab with enhanced quality
-            with tabs[5]:
-                wc = WordCloud(
-                    width=800, height=400,
-                    background_color='black',
-                    max_words=200,
-                    stopwords=STOPWORDS,
-                    colormap='plasma',
-                    contour_width=1,
-                    contour_color='white'
-                ).generate(' '.join(comments))
-                st.image(wc.to_array(), use_column_width=True)
+            known = self.db.fetch_comment_versions(vid) if persist and incremental else None
+            if known:
+                self._run_incremental(vid, title, url, known)
+                return
+            status = st.empty()
+            live = st.empty()
+            agg = SentimentAggregate()
+            db_seconds = 0.0
+            # rows are staged in the background and swapped in atomically at the end
+            load = self.db.begin_load(vid, title, url) if persist else None
+            export = self.store.begin(vid, title, url) if self.store else None
+            # duplicate and near-duplicate comments are scored and stored once per group
+            dedup = DuplicateIndex()
+            # each page is filtered, scored, stored and charted as soon as it arrives
+            try:
+                for page in self.yt.get_comment_pages(vid, self.filter):
+                    groups = dedup.collapse(page)
+                    batch = self.sent.analyze_groups(groups, [sanitize_text(g.comment.text) for g in groups], subjectivity=True)
+                    agg.update(batch)
+                    if load or export:
+                        rows, repeats = group_rows(groups, batch)
+                    for sink in (load, export):
+                        if sink:
+                            sink.add(rows)
+                            sink.add_repeats(repeats)
+                    status.info(f'Fetched and analyzed {agg.total} comments...')
+                    with stage('render.live'), live.container():
+                        self._render_live(agg)
+                summary = agg.to_summary()
+                if load:
+                    start_time = time.perf_counter()
+                    load.commit(summary)
+                    db_seconds = time.perf_counter() - start_time
+                if export:
+                    export.commit(summary)
+            except Exception:
+                if load:
+                    load.abort()
+                if export:
+                    export.abort()
+                raise
+            live.empty()
+            status.success(f'Analysis Done! {agg.total} comments analyzed, {len(dedup)} after collapsing duplicates.')
+            cache = self.sent.cache.stats()
+            st.caption(f"Sentiment cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)")
+            self._remember('Analyze', vid, title, agg)
+            with stage('render.tabs'):
+                self._render_tabs(vid, agg)
             if persist:
-                # measure DB write time using batch inserts
-                start_time = time.perf_counter()
-                self.db.insert_video(vid, title, url)
-                self.db.delete_comments_for_video(vid)
-                # 1) batch insert comments, get their IDs
-                comment_ids = self.db.insert_comments_batch(vid, comments, comment_likes)
-                # 2) compute sentiment labels & scores
-                scores = [self.sent.score(c) for c in comments]
-                labels = ['Positive' if s>=0.05 else 'Negative' if s<=-0.05 else 'Neutral' for s in scores]
-                # 3) batch insert sentiments for comment IDs
-                self.db.insert_sentiments_batch(comment_ids, labels, scores)
-                elapsed = time.perf_counter() - start_time
-                st.info(f"Records inserted to DB, it took {elapsed:.2f} seconds")
+                st.info(f"Records committed to DB, the final write took {db_seconds:.2f} seconds")
         except Exception as e:
             st.error(f'Error: {e}')
 
-    def _show_charts(self, comments, counts, tops):
+    def _show_metrics(self, metrics: RunMetrics):
+        with st.expander('Performance'):
+            c = metrics.counters
+            cols = st.columns(4)
+            cols[0].metric('Run time', f'{metrics.seconds:.2f}s')
+            cols[1].metric('API calls', c.get('api.calls', 0), help=f"{c.get('api.retries', 0)} retries")
+            cols[2].metric('Quota units', c.get('api.quota_units', 0))
+            rate = metrics.cache_hit_rate()
+            cols[3].metric('Cache hit rate', '-' if rate is None else f'{rate:.0%}')
+            st.caption('Stage seconds are summed over threads and worker processes, so they can exceed the run time.')
+            st.dataframe(metrics.rows(), use_container_width=True)
+            if metrics.profile_report:
+                st.code(metrics.profile_report)
+            st.download_button(
+                'Download metrics (JSON lines)', metrics.to_jsonl(), file_name='metrics.jsonl',
+                mime='application/x-ndjson'
+            )
+
+    def _bar_chart(self, counts: dict):
+        import pandas as pd
+        import altair as alt
+        bar_df = pd.DataFrame({'Sentiment': list(counts.keys()), 'Count': list(counts.values())})
+        return alt.Chart(bar_df).mark_bar().encode(
+            x='Sentiment', y='Count',
+            color=alt.Color('Sentiment', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green']))
+        )
+
+    def _hist_chart(self, agg: SentimentAggregate):
+        import altair as alt
+        from chart_data import histogram_frame
+        return alt.Chart(histogram_frame(agg)).mark_bar().encode(
+            x=alt.X('Score:Q', bin='binned', scale=alt.Scale(domain=[-1, 1])), x2='Score_end:Q', y='Count:Q'
+        )
+
+    def _render_live(self, agg: SentimentAggregate):
+        cols = st.columns(3)
+        for col, lbl in zip(cols, ['Positive', 'Neutral', 'Negative']):
+            col.metric(lbl, agg.counts[lbl])
+        left, right = st.columns(2)
+        left.altair_chart(self._bar_chart(agg.counts), use_container_width=True)
+        right.altair_chart(self._hist_chart(agg), use_container_width=True)
+
+    def _scatter_chart(self, rows: dict, fill=None):
+        import altair as alt
+        from chart_data import scatter_frame
+        return alt.Chart(scatter_frame(rows, fill)).mark_circle().encode(
+            x=alt.X('Sentiment', scale=alt.Scale(domain=[-1,1])),
+            y=alt.Y('Subjectivity', scale=alt.Scale(domain=[0,1])),
+            color=alt.Color('Label', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green'])),
+            tooltip=['Label','Sentiment','Subjectivity','Comment']
+        )
+
+    def _word_cloud(self, vid: str, agg: SentimentAggregate, label: str = None):
+        fingerprint = (agg.total, agg.counts[label] if label else agg.total, sum(map(len, agg.tokens.values())))
+        return word_cloud_image(vid, label, fingerprint, agg)
+
+    def _render_tabs(self, vid: str, agg: SentimentAggregate):
+        import pandas as pd
+        from chart_data import table_frame, table_page, page_count
+        counts, tops = agg.counts, agg.tops
+        rows = agg.columns()
+        comments = rows['comments']
+        # Dedicated tabs for table and each chart
+        tabs = st.tabs(['Data Table', 'Bar Chart', 'Histogram', 'Pie Chart', 'Scatter Plot', 'Word Cloud'])
+        labels, sizes = list(counts.keys()), list(counts.values())
+        # Data Table tab
+        with tabs[0]:
+            st.subheader('Comments & Sentiment Table')
+            if len(comments) < agg.sampled_from:
+                st.caption(f'Showing a random sample of {len(comments)} of {agg.sampled_from} distinct comments '
+                           f'({agg.total} in all).')
+            elif len(comments) < agg.total:
+                st.caption(f'Duplicate comments are shown once: {len(comments)} distinct of {agg.total} comments.')
+            df = table_frame(rows)
+            # one page at a time, so the browser never gets the whole sample
+            pages = page_count(df)
+            page = st.number_input('Page', min_value=1, max_value=pages, value=1, key=f'table_page_{vid}')
+            st.dataframe(table_page(df, page))
+            st.caption(f'Page {page} of {pages}, most liked first.')
+            st.markdown(':green[**Top Positive Comment:**]')
+            st.write(f"{sanitize_text(tops['Positive']['comment'])} (score: {tops['Positive']['score']})")
+            st.markdown(':red[**Top Negative Comment:**]')
+            st.write(f"{sanitize_text(tops['Negative']['comment'])} (score: {tops['Negative']['score']})")
+        # Bar Chart tab
+        with tabs[1]:
+            st.altair_chart(self._bar_chart(counts), use_container_width=True)
+        # Histogram tab
+        with tabs[2]:
+            st.altair_chart(self._hist_chart(agg), use_container_width=True)
+        # Pie Chart tab
+        with tabs[3]:
+            pie_df = pd.DataFrame({'Sentiment': labels, 'Count': sizes})
+            colors = ['red' if l=='Negative' else 'grey' if l=='Neutral' else 'green' for l in pie_df['Sentiment']]
+            st.plotly_chart({'data': [{'labels': pie_df['Sentiment'], 'values': pie_df['Count'], 'type': 'pie', 'marker': {'colors': colors}}]}, use_container_width=True)
+        # Scatter Plot tab
+        with tabs[4]:
+            st.altair_chart(self._scatter_chart(rows), use_container_width=True)
+        # Word Cloud tab, drawn from the token index of every comment of the chosen sentiment
+        with tabs[5]:
+            choice = st.radio('Comments', ['All', *LABELS], horizontal=True, key=f'wordcloud_{vid}')
+            image = self._word_cloud(vid, agg, None if choice == 'All' else choice)
+            if image is not None:
+                st.image(image, use_column_width=True)
+            else:
+                st.caption('No words to show.')
+
+    def _show_charts(self, vid: str, agg: SentimentAggregate):
+        import pandas as pd
+        from textblob import TextBlob
+        counts, tops = agg.counts, agg.tops
+        rows = agg.columns()
         labels, sizes = list(counts.keys()), list(counts.values())
         col1, col2, col3 = st.columns([1.2,1,1.2])
         with col1:
@@ -196,34 +455,19 @@ class StreamlitApp:
             st.table(counts)
         with col2:
             st.markdown('#### Bar & Histogram')
-            df = pd.DataFrame({'Sentiment':labels,'Count':sizes})
-            bar = alt.Chart(df).mark_bar().encode(
-                x='Sentiment', y='Count',
-                color=alt.Color('Sentiment', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green']))
-            )
-            st.altair_chart(bar, use_container_width=True)
-            hist_df = pd.DataFrame({'Score':[self.sent.score(c) for c in comments]})
-            hist = alt.Chart(hist_df).mark_bar().encode(x=alt.X('Score:Q',bin=True),y='count()')
-            st.altair_chart(hist, use_container_width=True)
+            st.altair_chart(self._bar_chart(counts), use_container_width=True)
+            st.altair_chart(self._hist_chart(agg), use_container_width=True)
         with col3:
             st.markdown('#### Word Clouds')
-            wc_all = WordCloud(width=400,height=200,background_color='white').generate(' '.join(comments))
-            st.image(wc_all.to_array())
+            image = self._word_cloud(vid, agg)
+            if image is not None:
+                st.image(image)
             st.markdown('#### Top Comments')
             for k in tops:
                 st.markdown(f'**{k}**: {sanitize_text(tops[k]["comment"])} (score: {tops[k]["score"]})')
 
-        scores = [self.sent.score(c) for c in comments]
-        subjects = [TextBlob(c).sentiment.subjectivity for c in comments]
-        labels_list = ['Positive' if s>=0.05 else 'Negative' if s<=-0.05 else 'Neutral' for s in scores]
-        sc_df = pd.DataFrame({'Sentiment':scores,'Subjectivity':subjects,'Comment':comments,'Label':labels_list})
-        chart = alt.Chart(sc_df).mark_circle().encode(
-            x=alt.X('Sentiment', scale=alt.Scale(domain=[-1,1])),
-            y=alt.Y('Subjectivity', scale=alt.Scale(domain=[0,1])),
-            color=alt.Color('Label', scale=alt.Scale(domain=['Negative','Neutral','Positive'], range=['red','grey','green'])),
-            tooltip=['Label','Sentiment','Subjectivity','Comment']
-        )
-        st.altair_chart(chart, use_container_width=True)
+        fill = lambda c: TextBlob(c).sentiment.subjectivity
+        st.altair_chart(self._scatter_chart(rows, fill), use_container_width=True)
 
 if __name__ == '__main__':
     StreamlitApp().run()
@@ -0,0 +1,110 @@
+import hashlib, sqlite3, threading
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text: str) -> str:
+    # NFC + collapsed whitespace; VADER and TextBlob both tokenise on whitespace,
+    # so this never changes a score while folding trivially different copies together
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+class SentimentCache:
+    """Content-addressed cache of ``(score, subjectivity)`` keyed by ``text_key``.
+
+    Holds up to ``maxsize`` entries in an in-memory LRU. When ``path`` is given,
+    entries are also written to a SQLite file so they survive process restarts;
+    memory misses fall through to disk and are promoted back into the LRU.
+    Subjectivity is None for entries scored without it.
+    """
+
+    def __init__(self, maxsize: int = 100000, path: str = None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS scores ('
+                'key TEXT PRIMARY KEY, score REAL NOT NULL, subjectivity REAL)'
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, value: tuple):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: list, subjectivity: bool = False) -> dict:
+        """Return cached values for ``keys``; entries lacking a required subjectivity count as misses."""
+        found, missing = {}, []
+        with self._lock:
+            for k in keys:
+                val = self._lru.get(k)
+                if val is not None and (not subjectivity or val[1] is not None):
+                    self._lru.move_to_end(k)
+                    found[k] = val
+                else:
+                    missing.append(k)
+            if missing and self._db is not None:
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i:i+500]
+                    rows = self._db.execute(
+                        'SELECT key, score, subjectivity FROM scores WHERE key IN (%s)' % ','.join('?' * len(chunk)),
+                        chunk
+                    ).fetchall()
+                    for k, sc, subj in rows:
+                        if not subjectivity or subj is not None:
+                            found[k] = (sc, subj)
+                            self._remember(k, (sc, subj))
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str, subjectivity: bool = False):
+        return self.get_many([key], subjectivity).get(key)
+
+    def put_many(self, items: dict):
+        with self._lock:
+            for k, val in items.items():
+                old = self._lru.get(k)
+                if val[1] is None and old is not None and old[1] is not None:
+                    val = (val[0], old[1])
+                self._remember(k, val)
+            if self._db is not None:
+                self._db.executemany(
+                    'INSERT INTO scores (key, score, subjectivity) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET score = excluded.score, '
+                    'subjectivity = COALESCE(excluded.subjectivity, scores.subjectivity)',
+                    [(k, sc, subj) for k, (sc, subj) in items.items()]
+                )
+                self._db.commit()
+
+    def put(self, key: str, score: float, subjectivity: float = None):
+        self.put_many({key: (score, subjectivity)})
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'size': len(self._lru)}
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute('DELETE FROM scores')
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
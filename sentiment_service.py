@@ -1,36 +1,272 @@
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import random, re
+from collections import Counter
+from scoring_engine import ScoringEngine
+from sentiment_cache import SentimentCache, text_key
+from instrumentation import stage, count
+
+LABELS = ('Positive', 'Negative', 'Neutral')
+HIST_BINS = 20
+# WordCloud's own word pattern; tokens kept per label in a stored summary
+TOKEN_RE = re.compile(r"\w[\w']*")
+TOKEN_LIMIT = 2000
+
+def label_for(score: float) -> str:
+    if score >= 0.05:
+        return 'Positive'
+    if score <= -0.05:
+        return 'Negative'
+    return 'Neutral'
+
+def hist_bin(score: float) -> int:
+    # index of the equal-width bin over [-1, 1] holding score
+    return min(int((score + 1) / 2 * HIST_BINS), HIST_BINS - 1)
+
+def count_tokens(comments: list) -> Counter:
+    # one lowercase findall over the joined texts instead of one per comment
+    return Counter(TOKEN_RE.findall(' '.join(comments).lower()))
+
+def empty_tops() -> dict:
+    return {
+        'Positive': {'score': -1, 'comment': ''},
+        'Negative': {'score': 1, 'comment': ''},
+        'Neutral':  {'score': -1, 'comment': ''}
+    }
+
+def update_tops(top: dict, comment: str, score: float, label: str):
+    if label == 'Positive' and score > top['Positive']['score']:
+        top['Positive'] = {'score': score, 'comment': comment}
+    elif label == 'Negative' and score < top['Negative']['score']:
+        top['Negative'] = {'score': score, 'comment': comment}
+    elif label == 'Neutral' and abs(score) > abs(top['Neutral']['score']):
+        top['Neutral'] = {'score': score, 'comment': comment}
+
+class SentimentBatch:
+    """Columnar result of scoring a list of comments exactly once.
+
+    ``multiplicities`` weights each row when it stands for a group of
+    duplicate comments (see ``dedup``); ``repeats`` marks rows adding copies
+    to a group already counted from an earlier page.
+    """
+
+    def __init__(self, comments: list, scores: list, likes: list = None, subjectivities: list = None,
+                 multiplicities: list = None, repeats: list = None):
+        self.comments = comments
+        self.scores = scores
+        self.likes = likes if likes is not None else [0] * len(comments)
+        self.subjectivities = subjectivities
+        self.multiplicities = multiplicities if multiplicities is not None else [1] * len(comments)
+        self.repeats = repeats
+        self.labels = [label_for(s) for s in scores]
+        self.counts = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
+        self.tops = empty_tops()
+        for c, s, lbl, m in zip(comments, scores, self.labels, self.multiplicities):
+            self.counts[lbl] += m
+            update_tops(self.tops, c, s, lbl)
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def total(self) -> int:
+        return sum(self.multiplicities)
+
+class SentimentAggregate:
+    """Running counts, top comments, score histogram and token counts, merged one batch at a time.
+
+    Only a uniform reservoir sample of at most ``max_rows`` rows is retained
+    for the per-comment views, so memory stays bounded however many pages
+    are merged. Token counts are kept per label so word clouds of any
+    sentiment are drawn from them without re-reading the comments.
+    """
+
+    def __init__(self, max_rows: int = 5000, seed: int = 0):
+        self.max_rows = max_rows
+        self.total = 0
+        self.counts = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
+        self.tops = empty_tops()
+        self.hist = [0] * HIST_BINS
+        self.tokens = {lbl: Counter() for lbl in LABELS}
+        # sampled (comment, likes, score, label, subjectivity) rows
+        self.rows = []
+        self._seen = 0
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_summary(cls, summary: dict, max_rows: int = 5000):
+        """Rebuild the aggregates from a stored summary row (see ``to_summary``)."""
+        agg = cls(max_rows)
+        agg.total = summary['total']
+        agg.counts = dict(summary['counts'])
+        agg.tops = dict(summary['tops'])
+        agg.hist = list(summary['hist'])
+        if summary.get('tokens'):
+            agg.merge_tokens(summary['tokens'])
+        return agg
+
+    def to_summary(self) -> dict:
+        return {
+            'total': self.total, 'counts': self.counts, 'tops': self.tops, 'hist': self.hist,
+            'tokens': self.token_summary()
+        }
+
+    def token_summary(self, limit: int = TOKEN_LIMIT) -> dict:
+        """The ``limit`` most frequent tokens of each label, as stored with the summary."""
+        return {lbl: dict(c.most_common(limit)) for lbl, c in self.tokens.items()}
+
+    @property
+    def has_tokens(self) -> bool:
+        return any(self.tokens.values())
+
+    def update(self, batch: SentimentBatch):
+        for lbl, n in batch.counts.items():
+            self.counts[lbl] += n
+        for lbl, top in batch.tops.items():
+            if top['comment']:
+                update_tops(self.tops, top['comment'], top['score'], lbl)
+        for s, m in zip(batch.scores, batch.multiplicities):
+            self.hist[hist_bin(s)] += m
+        self.total += batch.total
+        self.add_tokens(batch)
+        self.add_sample(batch)
+
+    def add_tokens(self, batch: SentimentBatch):
+        by_label = {lbl: [] for lbl in LABELS}
+        for c, lbl, m in zip(batch.comments, batch.labels, batch.multiplicities):
+            if m == 1:
+                by_label[lbl].append(c)
+            else:
+                self.tokens[lbl].update({w: n * m for w, n in count_tokens([c]).items()})
+        for lbl, comments in by_label.items():
+            if comments:
+                self.tokens[lbl].update(count_tokens(comments))
+
+    def merge_tokens(self, tokens: dict):
+        """Add per-label token counts, e.g. from another aggregate's ``token_summary``."""
+        for lbl, counts in tokens.items():
+            self.tokens[lbl].update(counts)
+
+    def word_frequencies(self, label: str = None, stopwords=()) -> dict:
+        """Word cloud frequencies of one label, or all, cleaned the way WordCloud cleans text.
+
+        Drops a trailing 's, numbers and stopwords and folds plurals into their
+        singular when both occur, over the distinct tokens only.
+        """
+        counts = Counter()
+        for lbl in ([label] if label else LABELS):
+            counts.update(self.tokens[lbl])
+        words = Counter()
+        for word, n in counts.items():
+            if word.endswith("'s"):
+                word = word[:-2]
+            if word and not word.isdigit() and word not in stopwords:
+                words[word] += n
+        for word in [w for w in words if w.endswith('s') and not w.endswith('ss')]:
+            if word[:-1] in words:
+                words[word[:-1]] += words.pop(word)
+        return dict(words)
+
+    def add_sample(self, batch: SentimentBatch):
+        """Offer the batch's rows to the reservoir sample without touching the aggregates."""
+        subjects = batch.subjectivities or [None] * len(batch)
+        rows = zip(batch.comments, batch.likes, batch.scores, batch.labels, subjects)
+        if batch.repeats:
+            # groups already sampled, or not, when first seen
+            rows = (row for row, repeat in zip(rows, batch.repeats) if not repeat)
+        for row in rows:
+            self._seen += 1
+            if len(self.rows) < self.max_rows:
+                self.rows.append(row)
+            else:
+                j = self._rng.randrange(self._seen)
+                if j < self.max_rows:
+                    self.rows[j] = row
+
+    @property
+    def sampled_from(self) -> int:
+        """Rows offered to the sample: distinct comments once duplicates are collapsed."""
+        return self._seen
+
+    @property
+    def hist_edges(self) -> list:
+        return [-1 + 2 * i / HIST_BINS for i in range(HIST_BINS + 1)]
+
+    def columns(self) -> dict:
+        """The sampled rows as columns."""
+        cols = list(zip(*self.rows)) if self.rows else [()] * 5
+        return dict(zip(('comments', 'likes', 'scores', 'labels', 'subjectivities'), map(list, cols)))
 
 class SentimentService:
-    def __init__(self):
+    def __init__(self, engine: ScoringEngine = None, cache: SentimentCache = None):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
         self.vader = SentimentIntensityAnalyzer()
+        self.engine = engine or ScoringEngine()
+        self.cache = cache
+        self._last = None
 
     def score(self, text: str) -> float:
-        return self.vader.polarity_scores(text)['compound']
-
-    def classify_counts(self, comments: list) -> dict:
-        counts = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
-        for c in comments:
-            s = self.score(c)
-            if s >= 0.05:
-                counts['Positive'] += 1
-            elif s <= -0.05:
-                counts['Negative'] += 1
-            else:
-                counts['Neutral'] += 1
-        return counts
-
-    def top_comments(self, comments: list) -> dict:
-        top = {
-            'Positive': {'score': -1, 'comment': ''},
-            'Negative': {'score': 1, 'comment': ''},
-            'Neutral':  {'score': -1, 'comment': ''}
-        }
-        for c in comments:
-            s = self.score(c)
-            if s >= 0.05 and s > top['Positive']['score']:
-                top['Positive'] = {'score': s, 'comment': c}
-            if s <= -0.05 and s < top['Negative']['score']:
-                top['Negative'] = {'score': s, 'comment': c}
-            if -0.05 < s < 0.05 and abs(s) > abs(top['Neutral']['score']):
-                top['Neutral'] = {'score': s, 'comment': c}
-        return top
\ No newline at end of file
+        if self.cache is None:
+            return self.vader.polarity_scores(text)['compound']
+        key = text_key(text)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit[0]
+        s = self.vader.polarity_scores(text)['compound']
+        self.cache.put(key, s)
+        return s
+
+    def analyze_batch(self, comments: list, likes: list = None, subjectivity: bool = False,
+                      multiplicities: list = None, repeats: list = None) -> SentimentBatch:
+        """Score every comment once and return scores, labels, counts and tops.
+
+        With a cache, duplicate texts in the batch and texts seen before are
+        looked up instead of being scored again. ``multiplicities`` and
+        ``repeats`` are passed on to the ``SentimentBatch``.
+        """
+        if self.cache is None:
+            scores, subjects = self.engine.score(comments, subjectivity)
+            return SentimentBatch(comments, scores, likes, subjects, multiplicities, repeats)
+        with stage('cache.lookup', len(comments)):
+            keys = [text_key(c) for c in comments]
+            unique = dict(zip(keys, comments))
+            found = self.cache.get_many(list(unique), subjectivity)
+            todo = [k for k in unique if k not in found]
+        count('cache.duplicates', len(keys) - len(unique))
+        count('cache.hits', len(unique) - len(todo))
+        count('cache.misses', len(todo))
+        if todo:
+            new_scores, new_subjects = self.engine.score([unique[k] for k in todo], subjectivity)
+            new = {
+                k: (sc, new_subjects[i] if subjectivity else None)
+                for i, (k, sc) in enumerate(zip(todo, new_scores))
+            }
+            with stage('cache.store', len(new)):
+                self.cache.put_many(new)
+            found.update(new)
+        scores = [found[k][0] for k in keys]
+        subjects = [found[k][1] for k in keys] if subjectivity else None
+        return SentimentBatch(comments, scores, likes, subjects, multiplicities, repeats)
+
+    def analyze_groups(self, groups: list, comments: list, subjectivity: bool = False) -> SentimentBatch:
+        """``analyze_batch`` over duplicate groups (see ``dedup``), ``comments`` being their cleaned texts."""
+        return self.analyze_batch(
+            comments, [g.comment.likes for g in groups], subjectivity,
+            [g.multiplicity for g in groups], [g.repeat for g in groups]
+        )
+
+    def _batch(self, comments) -> SentimentBatch:
+        # a list is scored once and kept, so classify_counts and top_comments over it share one batch
+        if isinstance(comments, SentimentBatch):
+            return comments
+        key = tuple(comments)
+        last = self._last
+        if last is None or last[0] != key:
+            last = self._last = (key, self.analyze_batch(list(key)))
+        return last[1]
+
+    def classify_counts(self, comments) -> dict:
+        """Label counts of a ``SentimentBatch``, or of a list of comments scored once."""
+        return self._batch(comments).counts
+
+    def top_comments(self, comments) -> dict:
+        """Top comment per label of a ``SentimentBatch``, or of a list of comments scored once."""
+        return self._batch(comments).tops
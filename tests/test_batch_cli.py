@@ -0,0 +1,18 @@
+import json, time
+import batch_cli
+from benchmarks.fake_youtube import FakeYouTubeServer
+from youtube_client import YouTubeClient
+
+def _run(monkeypatch, url: str, args: list) -> int:
+    monkeypatch.setattr(batch_cli, 'YouTubeClient', lambda key: YouTubeClient(key, base_url=url))
+    return batch_cli.main(args + ['--no-db', '--workers', '1'])
+
+def test_playlist_deferred_when_todays_budget_is_spent(monkeypatch, tmp_path):
+    ck = tmp_path / 'checkpoint.json'
+    ck.write_text(json.dumps({'quota_day': time.strftime('%Y-%m-%d', time.gmtime()), 'quota_units': 99}))
+    with FakeYouTubeServer(n_comments=10, latency=0.0, playlist_size=120) as yt:
+        assert _run(monkeypatch, yt.url, ['--playlist', 'PLxxxxxxxxxxxxxxxx', '--quota', '100',
+                                          '--checkpoint', str(ck)]) == 0
+    state = json.loads(ck.read_text())
+    # the listing needs three pages; only one fit, and it is counted
+    assert state['playlists'] == {} and state['quota_units'] == 100
@@ -0,0 +1,39 @@
+import re
+import pytest
+from comment_filter import CommentFilter
+
+RULES = {
+    'repeats': [r'(\w)\1{9,}'],
+    'pairs': [r'(?i)(ab)\1', r'(?i)(?P<x>[xz])-(?P=x)'],
+    'named': [r'(?P<x>promo) code', r'(?i)(?P<x>win) (a|an) (?:prize|iphone)'],
+    'plain': [r'(?i)giveaway', r'DM me', r'(?i)(b[a-z]t)coin'],
+}
+TEXTS = [
+    'soooooooooooooo good 😀 café', 'soooooooooooooo good', 'so good', 'xx ABAB', 'xx abab', 'xx abAB',
+    'a Z-z b', 'a z-x b', 'use promo code now', 'use PROMO code', 'WIN an iPhone', 'win a prize 😀',
+    'GIVEAWAY!', 'dm me', 'DM me café', 'BITCOIN', 'Check out my channel', 'free crypto here', 'just a comment',
+]
+
+def _expected(cf: CommentFilter, text: str) -> bool:
+    return any(re.search(p, text) for pats in cf.rule_sets.values() for p in pats)
+
+def test_registered_rules_match_like_separate_patterns():
+    cf = CommentFilter()
+    for name, patterns in RULES.items():
+        cf.register_rules(name, patterns)
+    for text in TEXTS:
+        assert cf._matches_rules(text) == _expected(cf, text), text
+    assert cf._matches_rules('soooooooooooooo good 😀 café')
+    assert cf._matches_rules('xx ABAB')
+
+def test_removed_rules_stop_matching():
+    cf = CommentFilter()
+    cf.register_rules('repeats', RULES['repeats'])
+    cf.remove_rules('repeats')
+    assert not cf._matches_rules('soooooooooooooo good')
+
+def test_invalid_rules_are_not_registered():
+    cf = CommentFilter()
+    with pytest.raises(re.error):
+        cf.register_rules('bad', [r'(unclosed'])
+    assert 'bad' not in cf.rule_sets
@@ -0,0 +1,27 @@
+from collections import defaultdict
+import pytest
+from dedup import normalize
+from benchmarks.corpus import make_corpus
+from benchmarks.bench_vader import make_stress_corpus
+
+@pytest.mark.parametrize('a, b', [
+    ('ok.', 'ok'), ('no', 'no.'), ('I LOVE it', 'i love it'), ('this video :)', 'this video :('), ('wow??', 'wow?'),
+])
+def test_texts_vader_scores_apart_get_apart_keys(a, b):
+    assert normalize(a) != normalize(b)
+
+@pytest.mark.parametrize('a, b', [
+    ('Great video!!!!!!', 'great video!!!!'), ('great video', 'Great  video.'), ("don't stop", "Don't stop"),
+])
+def test_case_spacing_and_stripped_punctuation_fold(a, b):
+    assert normalize(a) == normalize(b)
+
+def test_texts_sharing_a_key_share_a_score():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    analyzer = SentimentIntensityAnalyzer()
+    texts = make_corpus(2000, floods=0.3) + make_stress_corpus(2000)
+    scores = defaultdict(set)
+    for t in texts:
+        for variant in (t, t.lower(), t + '.', t.capitalize(), t + '!!!!!!'):
+            scores[normalize(variant)].add(analyzer.polarity_scores(variant)['compound'])
+    assert [k for k, v in scores.items() if len(v) > 1] == []
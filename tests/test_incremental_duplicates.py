@@ -0,0 +1,78 @@
+"""Incremental runs over a video whose duplicate comments were collapsed.
+
+Runs the app's analysis headless against the fake YouTube and PostgREST
+servers from ``benchmarks``.
+"""
+import json
+import pytest
+from benchmarks.fake_youtube import FakeYouTubeServer, _comment
+from benchmarks.fake_postgrest import FakePostgREST
+
+VIDEO = 'abcdefghijk'
+URL = f'https://youtu.be/{VIDEO}'
+TEXTS = ['I really enjoyed watching this video', 'I really enjoyed watching this video',
+         'The editing in the second half was terrible', 'Thanks for explaining the history so clearly']
+
+@pytest.fixture
+def servers(monkeypatch):
+    with FakeYouTubeServer(n_comments=len(TEXTS), latency=0.0) as yt, FakePostgREST(latency=0.0) as pg:
+        for i, text in enumerate(TEXTS):
+            yt.threads[i] = (_comment(f'c{i:07d}', text, 10, f'2024-01-0{i + 1}T00:00:00Z'), [])
+        monkeypatch.setenv('SUPABASE_URL', pg.url)
+        monkeypatch.setenv('SUPABASE_KEY', pg.key)
+        import sentiment_analysis
+        from db_handler import DBHandler
+        from youtube_client import YouTubeClient
+        db, client = DBHandler(), YouTubeClient('k', base_url=yt.url)
+        monkeypatch.setattr(sentiment_analysis, 'get_db', lambda: db)
+        monkeypatch.setattr(sentiment_analysis, 'get_youtube_client', lambda: client)
+        monkeypatch.setattr(sentiment_analysis, 'get_result_store', lambda: None)
+        app = sentiment_analysis.StreamlitApp()
+        app._run_analysis(URL)
+        yield app, yt, pg
+
+def _edit(yt, i: int, text: str):
+    snippet = yt.threads[i][0]['snippet']
+    snippet.update(textDisplay=text, updatedAt='2030-01-01T00:00:00Z')
+
+def _stored(pg) -> dict:
+    rows = pg.db.execute('select yt_comment_id, comment_text, likes, multiplicity, aliases from comments').fetchall()
+    return {r[0].rsplit('-', 1)[1]: (r[1], r[2], r[3], sorted(json.loads(r[4]))) for r in rows}
+
+def _total(pg) -> int:
+    return pg.db.execute('select total from video_summaries').fetchone()[0]
+
+def test_copies_collapse_into_one_row(servers):
+    app, yt, pg = servers
+    stored = _stored(pg)
+    assert stored['c0000000'] == (TEXTS[0], 20, 2, [f'{VIDEO}-c0000001'])
+    assert 'c0000001' not in stored
+    assert _total(pg) == 4
+
+def test_edited_copy_leaves_its_group(servers):
+    app, yt, pg = servers
+    _edit(yt, 1, 'Actually the ending ruined it for me')
+    app._run_analysis(URL, incremental=True)
+    stored = _stored(pg)
+    assert stored['c0000000'] == (TEXTS[0], 10, 1, [])
+    assert stored['c0000001'] == ('Actually the ending ruined it for me', 10, 1, [])
+    assert _total(pg) == 4
+    # nothing changed since, so a further run stores nothing new
+    app._run_analysis(URL, incremental=True)
+    assert _stored(pg) == stored and _total(pg) == 4
+
+def test_edited_first_comment_hands_group_to_copy(servers):
+    app, yt, pg = servers
+    _edit(yt, 0, 'Actually the ending ruined it for me')
+    app._run_analysis(URL, incremental=True)
+    stored = _stored(pg)
+    # the copy keeps the old text, its likes and its score; the edited comment is stored on its own
+    assert stored['c0000001'] == (TEXTS[0], 10, 1, [])
+    assert stored['c0000000'] == ('Actually the ending ruined it for me', 10, 1, [])
+    scores = dict(pg.db.execute(
+        'select c.comment_text, s.sentiment_score from comments c join sentiments s on s.comment_id = c.id'
+    ).fetchall())
+    assert scores[TEXTS[0]] > 0 > scores['Actually the ending ruined it for me']
+    assert _total(pg) == 4
+    app._run_analysis(URL, incremental=True)
+    assert _stored(pg) == stored and _total(pg) == 4
@@ -0,0 +1,63 @@
+"""History and incremental runs with a result directory next to the database.
+
+The first run stores the video in the database only, as before
+``RESULTS_DIR`` was set; the store is switched on afterwards.
+"""
+import pytest
+from benchmarks.fake_youtube import FakeYouTubeServer, _comment
+from benchmarks.fake_postgrest import FakePostgREST
+
+VIDEO = 'abcdefghijk'
+URL = f'https://youtu.be/{VIDEO}'
+TEXTS = ['I really enjoyed watching this video', 'I really enjoyed watching this video',
+         'The editing in the second half was terrible']
+
+@pytest.fixture
+def servers(monkeypatch, tmp_path):
+    with FakeYouTubeServer(n_comments=len(TEXTS), latency=0.0) as yt, FakePostgREST(latency=0.0) as pg:
+        for i, text in enumerate(TEXTS):
+            yt.threads[i] = (_comment(f'c{i:07d}', text, 10, f'2024-01-0{i + 1}T00:00:00Z'), [])
+        monkeypatch.setenv('SUPABASE_URL', pg.url)
+        monkeypatch.setenv('SUPABASE_KEY', pg.key)
+        import sentiment_analysis
+        from db_handler import DBHandler
+        from result_store import ResultStore
+        from youtube_client import YouTubeClient
+        db, client, store = DBHandler(), YouTubeClient('k', base_url=yt.url), ResultStore(str(tmp_path))
+        monkeypatch.setattr(sentiment_analysis, 'get_db', lambda: db)
+        monkeypatch.setattr(sentiment_analysis, 'get_youtube_client', lambda: client)
+        monkeypatch.setattr(sentiment_analysis, 'get_result_store', lambda: None)
+        sentiment_analysis.StreamlitApp()._run_analysis(URL)
+        monkeypatch.setattr(sentiment_analysis, 'get_result_store', lambda: store)
+        yield sentiment_analysis.StreamlitApp(), yt
+
+def _rows(source) -> dict:
+    rows = {}
+    for page in source.fetch_analysis_pages(VIDEO):
+        for text, likes, label, m in zip(page['comments'], page['likes'], page['labels'], page['multiplicities']):
+            rows[text] = (likes, label, m)
+    return rows
+
+def test_history_lists_videos_without_a_file(servers):
+    app, yt = servers
+    assert not app.store.has(VIDEO)
+    assert [v['video_id'] for v in app._history_videos()] == [VIDEO]
+
+def test_incremental_run_writes_missing_file(servers):
+    app, yt = servers
+    app._run_analysis(URL, incremental=True)
+    assert app.store.has(VIDEO)
+    assert _rows(app.store) == _rows(app.db)
+    assert app.store.fetch_summary(VIDEO)['total'] == 3
+    assert [v['video_id'] for v in app._history_videos()] == [VIDEO]
+
+def test_file_follows_edited_copy(servers):
+    app, yt = servers
+    app._run_analysis(URL, incremental=True)
+    yt.threads[1][0]['snippet'].update(textDisplay='Actually the ending ruined it for me',
+                                       updatedAt='2030-01-01T00:00:00Z')
+    app._run_analysis(URL, incremental=True)
+    rows = _rows(app.store)
+    assert rows == _rows(app.db)
+    assert rows[TEXTS[0]][::2] == (10, 1)
+    assert app.store.fetch_summary(VIDEO)['total'] == 3
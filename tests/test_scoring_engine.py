@@ -0,0 +1,24 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import scoring_engine
+from scoring_engine import ScoringEngine
+
+def test_concurrent_scores_share_one_pool(monkeypatch):
+    created = []
+    def slow_pool(**kwargs):
+        # widen the window between checking for a pool and storing the new one
+        time.sleep(0.05)
+        created.append(ProcessPoolExecutor(**kwargs))
+        return created[-1]
+    monkeypatch.setattr(scoring_engine, 'ProcessPoolExecutor', slow_pool)
+    engine = ScoringEngine(workers=2, serial_threshold=1)
+    texts = ['great video', 'awful sound', 'fine'] * 10
+    try:
+        with ThreadPoolExecutor(8) as threads:
+            results = list(threads.map(lambda _: engine.score(texts), range(8)))
+        assert len(created) == 1
+        assert all(r == results[0] for r in results)
+    finally:
+        engine.close()
+        for pool in created:
+            pool.shutdown()
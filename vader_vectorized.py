@@ -0,0 +1,233 @@
+"""VADER compound scores for whole batches, computed with NumPy.
+
+``VectorizedVader.compound(texts)`` returns exactly what
+``SentimentIntensityAnalyzer().polarity_scores(t)['compound']`` returns for
+each text, quirks included, but does the per-word rules (lexicon valence,
+``no``/negation handling, boosters, ALL-CAPS emphasis, idioms, ``least``)
+as array operations over every token of the batch at once. Only the emoji
+translation, whitespace split and a memoised token lookup remain per text.
+One scorer can be shared by threads: its vocabulary is fixed at
+construction, and the token memo only ever holds recomputable values.
+"""
+import string
+import numpy as np
+
+def _but_check(values: list, bi: int) -> list:
+    # VADER's loop as written: list.index finds the first equal value, so with
+    # repeated valences the scaling can land on an earlier position
+    for sentiment in values:
+        si = values.index(sentiment)
+        if si < bi:
+            values[si] = sentiment * 0.5
+        elif si > bi:
+            values[si] = sentiment * 1.5
+    return values
+
+class _TokenIndex(dict):
+    # raw whitespace token -> word id * 2 + isupper, computed on first sight;
+    # emptied once it holds max_tokens, so it stays bounded
+    def __init__(self, scorer, max_tokens: int):
+        super().__init__()
+        self.scorer = scorer
+        self.max_tokens = max_tokens
+
+    def __missing__(self, token: str) -> int:
+        stripped = token.strip(string.punctuation)
+        if len(stripped) <= 2:
+            stripped = token
+        code = self.scorer._lookup(stripped.lower()) * 2 + stripped.isupper()
+        if len(self) >= self.max_tokens:
+            self.clear()
+        self[token] = code
+        return code
+
+class VectorizedVader:
+    """Batch VADER scorer over an integer-indexed copy of the lexicon.
+
+    Every word VADER looks up gets an id; per-id arrays hold its lexicon
+    valence, booster value and negation flag. Any other word scores only
+    through those flags, so all of them share one "unknown" id, or the
+    "unknown negation" id when they contain "n't". Up to ``max_tokens`` raw
+    tokens are memoised. Batches are processed ``batch_size`` texts at a time.
+    """
+
+    def __init__(self, batch_size: int = 4096, max_tokens: int = 500000):
+        from vaderSentiment import vaderSentiment as vs
+        analyzer = vs.SentimentIntensityAnalyzer()
+        self.batch_size = batch_size
+        self.n_scalar, self.c_incr = vs.N_SCALAR, vs.C_INCR
+        self._lexicon = analyzer.lexicon
+        self._booster = vs.BOOSTER_DICT
+        self._negate = set(vs.NEGATE)
+        self._emoji = str.maketrans({e: ' ' + d for e, d in analyzer.emojis.items() if len(e) == 1})
+        # id 0 is the "no word" sentinel used past either end of a comment,
+        # ids 1 and 2 are the unknown word without and with "n't"
+        self._ids = {}
+        features = [(0.0, False, 0.0, False, False), (0.0, False, 0.0, False, False),
+                    (0.0, False, 0.0, False, True)]
+        # the words VADER's rules compare against get ids even outside the lexicon
+        rule_words = 'no kind of but least at very never so this without doubt or nor'
+        for word in [*self._lexicon, *self._booster, *self._negate, *vs.SPECIAL_CASES, rule_words]:
+            for part in word.split(' '):
+                if part not in self._ids:
+                    self._ids[part] = len(features)
+                    lex = self._lexicon.get(part)
+                    features.append((
+                        0.0 if lex is None else lex, lex is not None,
+                        self._booster.get(part, 0.0), part in self._booster,
+                        part in self._negate or "n't" in part,
+                    ))
+        lex, in_lex, boost, is_boost, neg = zip(*features)
+        self._arrays = tuple(map(np.array, (lex, in_lex, boost, is_boost, neg)))
+        ids = self._ids.__getitem__
+        self.NO, self.KIND, self.OF, self.BUT, self.LEAST = ids('no'), ids('kind'), ids('of'), ids('but'), ids('least')
+        self.AT, self.VERY, self.NEVER, self.SO, self.THIS = ids('at'), ids('very'), ids('never'), ids('so'), ids('this')
+        self.WITHOUT, self.DOUBT, self.OR, self.NOR = ids('without'), ids('doubt'), ids('or'), ids('nor')
+        self._index = _TokenIndex(self, max_tokens)
+        # multi-word idioms and boosters, matched as id n-grams
+        self._idioms = {2: [], 3: []}
+        for phrase, value in vs.SPECIAL_CASES.items():
+            parts = phrase.split(' ')
+            if len(parts) in self._idioms:
+                self._idioms[len(parts)].append((tuple(map(ids, parts)), value))
+        self._ngram_boosters = {2: [], 3: []}
+        for phrase, value in self._booster.items():
+            parts = phrase.split(' ')
+            if len(parts) in self._ngram_boosters:
+                self._ngram_boosters[len(parts)].append((tuple(map(ids, parts)), value))
+
+    def _lookup(self, word: str) -> int:
+        wid = self._ids.get(word)
+        if wid is None:
+            wid = 2 if "n't" in word else 1
+        return wid
+
+    def compound(self, texts: list) -> list:
+        """Return the VADER compound score of every text, rounded to 4 places like VADER."""
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            out.extend(self._compound_batch(texts[i:i+self.batch_size]))
+        return out
+
+    def _compound_batch(self, texts: list) -> list:
+        table, lookup = self._emoji, self._index.__getitem__
+        codes, lens, excl, ques = [], [], [], []
+        for text in texts:
+            # emoji become their descriptions; the extra leading space VADER
+            # sometimes omits does not change the whitespace split
+            text = text.translate(table)
+            tokens = text.split()
+            lens.append(len(tokens))
+            codes.extend(map(lookup, tokens))
+            excl.append(text.count('!'))
+            ques.append(text.count('?'))
+        n_docs = len(texts)
+        LEX, IN_LEX, BOOST, IS_BOOST, NEG = self._arrays
+        N, C = self.n_scalar, self.c_incr
+
+        code = np.array(codes, dtype=np.int64)
+        wid, up = code >> 1, (code & 1).astype(bool)
+        lens = np.array(lens, dtype=np.int64)
+        doc = np.repeat(np.arange(n_docs), lens)
+        starts = np.cumsum(lens) - lens
+        pos = np.arange(len(code)) - starts[doc]
+        end = lens[doc]
+
+        def shift(a, k):
+            # a[i - k] within the same comment, sentinel 0/False outside it
+            out = np.zeros_like(a)
+            if k > 0:
+                out[k:] = a[:-k]
+                out[pos < k] = 0
+            else:
+                out[:k] = a[-k:]
+                out[pos >= end + k] = 0
+            return out
+        wm1, wm2, wm3, wp1, wp2 = shift(wid, 1), shift(wid, 2), shift(wid, 3), shift(wid, -1), shift(wid, -2)
+        upm = {1: shift(up, 1), 2: shift(up, 2), 3: shift(up, 3)}
+        n_up = np.bincount(doc, weights=up, minlength=n_docs)
+        cap_diff = ((n_up > 0) & (n_up < lens))[doc]
+
+        lex = LEX[wid]
+        scored = IN_LEX[wid] & ~IS_BOOST[wid] & ~((wid == self.KIND) & (wp1 == self.OF))
+        # "no" before another lexicon word negates it instead of counting itself
+        v = np.where((wid == self.NO) & IN_LEX[wp1], 0.0, lex)
+        after_no = (wm1 == self.NO) | (wm2 == self.NO) | ((wm3 == self.NO) & ((wm1 == self.OR) | (wm1 == self.NOR)))
+        v = np.where(after_no, lex * N, v)
+        v = np.where(up & cap_diff, np.where(v > 0, v + C, v - C), v)
+        so_this = lambda w: (w == self.SO) | (w == self.THIS)
+        for k, wk in ((1, wm1), (2, wm2), (3, wm3)):
+            # the k-th preceding word, when it is not a lexicon word itself
+            valid = (pos >= k) & ~IN_LEX[wk]
+            s = np.where(v < 0, -BOOST[wk], BOOST[wk])
+            s = np.where(IS_BOOST[wk] & upm[k] & cap_diff, np.where(v > 0, s + C, s - C), s)
+            if k == 2:
+                s = s * 0.95
+            elif k == 3:
+                s = s * 0.9
+            v = np.where(valid, v + s, v)
+            if k == 1:
+                v = np.where(valid & NEG[wm1], v * N, v)
+            elif k == 2:
+                never_so = (wm2 == self.NEVER) & so_this(wm1)
+                without_doubt = (wm2 == self.WITHOUT) & (wm1 == self.DOUBT)
+                v = np.where(valid & never_so, v * 1.25, np.where(valid & ~without_doubt & NEG[wm2], v * N, v))
+            else:
+                never_so = ((wm3 == self.NEVER) & so_this(wm2)) | so_this(wm1)
+                without_doubt = (wm3 == self.WITHOUT) & ((wm2 == self.DOUBT) | (wm1 == self.DOUBT))
+                v = np.where(valid & never_so, v * 1.25, np.where(valid & ~without_doubt & NEG[wm3], v * N, v))
+                v = self._idioms_check(v, valid, (wm3, wm2, wm1, wid, wp1, wp2))
+        least = (wm1 == self.LEAST) & ~IN_LEX[wm1]
+        v = np.where(least & (((pos > 1) & (wm2 != self.AT) & (wm2 != self.VERY)) | (pos == 1)), v * N, v)
+        sentiments = np.where(scored, v, 0.0)
+
+        # contrastive "but": VADER's quirky rescaling, per comment that has one
+        is_but = wid == self.BUT
+        if is_but.any():
+            for d in np.unique(doc[is_but]):
+                s, e = starts[d], starts[d] + lens[d]
+                bi = int(np.argmax(is_but[s:e]))
+                sentiments[s:e] = _but_check(sentiments[s:e].tolist(), bi)
+
+        # sum each comment's nonzero valences in token order, as Python's sum would
+        nz = np.flatnonzero(sentiments)
+        nz_doc = doc[nz]
+        counts = np.bincount(nz_doc, minlength=n_docs)
+        total = np.zeros(n_docs)
+        if len(nz):
+            rank = np.arange(len(nz)) - (np.cumsum(counts) - counts)[nz_doc]
+            grid = np.zeros((n_docs, counts.max()))
+            grid[nz_doc, rank] = sentiments[nz]
+            for col in grid.T:
+                total += col
+        excl = np.minimum(np.array(excl), 4) * 0.292
+        ques = np.array(ques)
+        punct = excl + np.where(ques > 1, np.where(ques <= 3, ques * 0.18, 0.96), 0)
+        total = np.where(total > 0, total + punct, np.where(total < 0, total - punct, total))
+        compound = np.clip(total / np.sqrt(total * total + 15), -1.0, 1.0)
+        return [round(c, 4) for c in compound.tolist()]
+
+    def _idioms_check(self, v, valid, window) -> np.ndarray:
+        wm3, wm2, wm1, w0, wp1, wp2 = window
+        def match(seq, phrases):
+            # value of the phrase the id sequence spells, NaN where none does
+            out = np.full(len(w0), np.nan)
+            for ids, value in phrases[len(seq)]:
+                hit = np.ones(len(w0), dtype=bool)
+                for col, wid in zip(seq, ids):
+                    hit &= col == wid
+                out = np.where(hit, value, out)
+            return out
+        # the first matching of these sequences wins, then the forward ones override
+        idiom = np.full(len(w0), np.nan)
+        for seq in reversed([(wm1, w0), (wm2, wm1, w0), (wm2, wm1), (wm3, wm2, wm1), (wm3, wm2)]):
+            m = match(seq, self._idioms)
+            idiom = np.where(np.isnan(m), idiom, m)
+        for seq in [(w0, wp1), (w0, wp1, wp2)]:
+            m = match(seq, self._idioms)
+            idiom = np.where(np.isnan(m), idiom, m)
+        v = np.where(valid & ~np.isnan(idiom), idiom, v)
+        for seq in [(wm3, wm2, wm1), (wm3, wm2), (wm2, wm1)]:
+            m = match(seq, self._ngram_boosters)
+            v = np.where(valid & ~np.isnan(m), v + np.nan_to_num(m), v)
+        return v
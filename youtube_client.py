@@ -1,10 +1,115 @@
 import re, time
-import html
-from googleapiclient.discovery import build
+import html, random, threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import stage, record, count, submit
+
+API_URL = 'https://www.googleapis.com/youtube/v3'
+# YouTube Data API v3 quota units per list call
+QUOTA_COSTS = {'commentThreads': 1, 'comments': 1, 'videos': 1, 'playlistItems': 1}
+# 403 reasons that are worth retrying; anything else (e.g. quotaExceeded) is final
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+class YouTubeAPIError(RuntimeError):
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(f'YouTube API error {status} ({reason}): {message}')
+        self.status = status
+        self.reason = reason
+
+class QuotaExceededError(YouTubeAPIError):
+    pass
+
+class QuotaTracker:
+    """Thread-safe count of API calls and quota units, with an optional budget."""
+
+    def __init__(self, budget: int = None):
+        self.budget = budget
+        self.units = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def charge(self, resource: str, units: int = None):
+        units = QUOTA_COSTS.get(resource, 1) if units is None else units
+        with self._lock:
+            if self.budget is not None and self.units + units > self.budget:
+                raise QuotaExceededError(403, 'quotaExceeded', f'local budget of {self.budget} units used up')
+            self.units += units
+            self.calls[resource] = self.calls.get(resource, 0) + 1
+        count('api.calls')
+        count('api.quota_units', units)
+
+    @property
+    def remaining(self):
+        return None if self.budget is None else self.budget - self.units
+
+Comment = namedtuple('Comment', ['text', 'likes', 'comment_id', 'published_at', 'updated_at'])
+
+def clean_comment_text(raw_txt: str) -> str:
+    # unescape HTML entities then remove <br> tags
+    clean = html.unescape(raw_txt)
+    return re.sub(r'<br\s*/?>', '\n', clean, flags=re.IGNORECASE)
+
+# helper to remove HTML line breaks
+def sanitize_text(text):
+    return re.sub(r'<br\s*/?>', ' ', text, flags=re.IGNORECASE)
 
 class YouTubeClient:
-    def __init__(self, api_key: str):
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+    """YouTube Data API client over a pooled HTTP connection.
+
+    Comment pages are prefetched on a thread pool so the next request is in
+    flight while the current page is cleaned and filtered, and reply threads
+    can be fetched in parallel. Rate-limit responses (429 and retryable 403s)
+    and 5xx errors are retried with exponential backoff, which also slows the
+    pacing of subsequent calls until requests succeed again.
+    """
+
+    def __init__(self, api_key: str, base_url: str = API_URL, max_connections: int = 8,
+                 max_retries: int = 5, quota: QuotaTracker = None):
+        import httpx
+        self.http = httpx.Client(
+            base_url=base_url, params={'key': api_key}, timeout=30,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.pool = ThreadPoolExecutor(max_workers=max_connections)
+        self.quota = quota or QuotaTracker()
+        self.max_retries = max_retries
+        self._pace = 0.0
+
+    def _get(self, resource: str, **params) -> dict:
+        with stage(f'youtube.{resource}') as timer:
+            resp = self._request(resource, params)
+            timer.items = len(resp.get('items', []))
+        return resp
+
+    def _request(self, resource: str, params: dict) -> dict:
+        params = {k: v for k, v in params.items() if v is not None}
+        for attempt in range(self.max_retries + 1):
+            if self._pace:
+                time.sleep(self._pace)
+            self.quota.charge(resource)
+            resp = self.http.get(f'/{resource}', params=params)
+            if resp.status_code == 200:
+                self._pace = self._pace / 2 if self._pace > 0.01 else 0.0
+                return resp.json()
+            try:
+                err = resp.json().get('error', {})
+            except ValueError:
+                err = {}
+            reason = (err.get('errors') or [{}])[0].get('reason', '')
+            message = err.get('message', resp.text[:200])
+            if resp.status_code == 403 and reason == 'quotaExceeded':
+                raise QuotaExceededError(403, reason, message)
+            retryable = (
+                resp.status_code == 429 or resp.status_code >= 500
+                or (resp.status_code == 403 and reason in RETRYABLE_REASONS)
+            )
+            if not retryable or attempt == self.max_retries:
+                raise YouTubeAPIError(resp.status_code, reason, message)
+            count('api.retries')
+            self._pace = min(max(self._pace * 2, 0.1), 10.0)
+            retry_after = resp.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else min(2 ** attempt * 0.5, 30.0)
+            time.sleep(delay * random.uniform(0.8, 1.2))
 
     def extract_video_id(self, url: str) -> str:
         regex = r'(?:v=|youtu\.be/|/v/|/embed/|/shorts/)([\w-]{11})'
@@ -13,33 +118,132 @@ class YouTubeClient:
             return match.group(1)
         raise ValueError('Invalid YouTube video URL')
 
+    def extract_playlist_id(self, url: str) -> str:
+        match = re.search(r'list=([\w-]+)', url) or re.fullmatch(r'([\w-]{13,})', url)
+        if match:
+            return match.group(1)
+        raise ValueError('Invalid YouTube playlist URL')
+
+    def get_playlist_video_ids(self, playlist_id: str, max_videos: int = None) -> list:
+        ids, token = [], None
+        while True:
+            resp = self._get('playlistItems', part='contentDetails', playlistId=playlist_id,
+                             maxResults=50, pageToken=token)
+            ids.extend(item['contentDetails']['videoId'] for item in resp.get('items', []))
+            token = resp.get('nextPageToken')
+            if not token or (max_videos and len(ids) >= max_videos):
+                return ids[:max_videos] if max_videos else ids
+
     def get_video_title(self, video_id: str) -> str:
-        resp = self.youtube.videos().list(part='snippet', id=video_id).execute()
+        resp = self._get('videos', part='snippet', id=video_id)
         items = resp.get('items', [])
         return items[0]['snippet']['title'] if items else 'Unknown Title'
 
-    def get_comments(self, video_id: str, comment_filter, max_comments: int = 4000) -> list:
-        comments, token = [], None
-        # fetch comments in pages of up to 100 until we reach max_comments
+    def _thread_pages(self, video_id: str, include_replies: bool = False, order: str = 'relevance'):
+        # yields commentThreads responses, keeping the next page request in flight
+        part = 'snippet,replies' if include_replies else 'snippet'
+        fetch = lambda token: self._get(
+            'commentThreads', part=part, videoId=video_id,
+            maxResults=100, pageToken=token, order=order
+        )
+        future = submit(self.pool, fetch, None)
+        while future is not None:
+            resp = future.result()
+            token = resp.get('nextPageToken')
+            future = submit(self.pool, fetch, token) if token else None
+            try:
+                yield resp
+            except GeneratorExit:
+                if future is not None:
+                    future.cancel()
+                raise
+
+    def _get_replies(self, parent_id: str) -> list:
+        items, token = [], None
         while True:
-            resp = self.youtube.commentThreads().list(
-                part='snippet', videoId=video_id,
-                maxResults=200, pageToken=token,
-                order='relevance'
-            ).execute()
-            for item in resp.get('items', []):
-                snippet = item['snippet']['topLevelComment']['snippet']
-                raw_txt = snippet.get('textDisplay', '')
-                like_count = snippet.get('likeCount', 0)
-                # unescape HTML entities then remove <br> tags
-                clean = html.unescape(raw_txt)
-                txt = re.sub(r'<br\s*/?>', '\n', clean, flags=re.IGNORECASE)
-                if not comment_filter.is_spam(txt):
-                    comments.append((txt, like_count))
-                    if len(comments) >= max_comments:
-                        return comments[:max_comments]
+            resp = self._get('comments', part='snippet', parentId=parent_id, maxResults=100, pageToken=token)
+            items.extend(resp.get('items', []))
             token = resp.get('nextPageToken')
             if not token:
-                break
-            time.sleep(0.1)
-        return comments[:max_comments]
+                return items
+
+    def get_comment_pages(self, video_id: str, comment_filter, max_comments: int = 4000,
+                          include_replies: bool = False, order: str = 'relevance', known: dict = None):
+        """Yield the cleaned, non-spam ``Comment`` rows of each API page as it arrives.
+
+        ``known`` maps already stored comment ids to their ``updatedAt``; those
+        comments are skipped unless edited since. Combined with ``order='time'``
+        (newest first) paging stops after the first page that reaches a known
+        top-level comment, so only the new part of the video is fetched; unknown
+        top-level comments after it on that page are skipped too.
+        """
+        kept = 0
+        for resp in self._thread_pages(video_id, include_replies, order):
+            threads = resp.get('items', [])
+            replies = {}
+            if include_replies:
+                # replies beyond the few embedded in the thread are fetched in parallel
+                for item in threads:
+                    embedded = item.get('replies', {}).get('comments', [])
+                    if item['snippet'].get('totalReplyCount', 0) > len(embedded):
+                        replies[item['id']] = submit(self.pool, self._get_replies, item['id'])
+                    else:
+                        replies[item['id']] = embedded
+            page = []
+            reached_known = False
+            # clean + spam-filter time only, excluding waits for reply pages
+            filter_seconds, seen = 0.0, 0
+            for item in threads:
+                top = item['snippet']['topLevelComment']
+                entries = [top]
+                if known is not None and top['id'] in known:
+                    reached_known = True
+                elif reached_known and order == 'time':
+                    # older than a stored comment but not stored itself: filtered out or
+                    # collapsed into a duplicate group by the previous run
+                    entries = []
+                if include_replies:
+                    thread_replies = replies[item['id']]
+                    if not isinstance(thread_replies, list):
+                        thread_replies = thread_replies.result()
+                    entries.extend(thread_replies)
+                for entry in entries:
+                    snippet = entry['snippet']
+                    updated = snippet.get('updatedAt')
+                    if known is not None and entry.get('id') in known and known[entry['id']] == updated:
+                        continue
+                    start = time.perf_counter()
+                    txt = clean_comment_text(snippet.get('textDisplay', ''))
+                    spam = comment_filter.is_spam(txt)
+                    filter_seconds += time.perf_counter() - start
+                    seen += 1
+                    if not spam:
+                        page.append(Comment(
+                            txt, snippet.get('likeCount', 0), entry.get('id'), snippet.get('publishedAt'), updated
+                        ))
+                        if kept + len(page) >= max_comments:
+                            for f in replies.values():
+                                if not isinstance(f, list):
+                                    f.cancel()
+                            record('filter', filter_seconds, seen)
+                            count('filter.kept', len(page))
+                            yield page
+                            return
+            record('filter', filter_seconds, seen)
+            count('filter.kept', len(page))
+            kept += len(page)
+            if page:
+                yield page
+            if reached_known:
+                return
+
+    def get_comments(self, video_id: str, comment_filter, max_comments: int = 4000,
+                     include_replies: bool = False, order: str = 'relevance', known: dict = None) -> list:
+        comments = []
+        for page in self.get_comment_pages(video_id, comment_filter, max_comments, include_replies, order, known):
+            comments.extend(page)
+        return comments
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.http.close()